@@ -11,6 +11,7 @@ from app.db.base import Base  # our metadata
 from app.models.user import User  # noqa: F401
 from app.models.token import RefreshToken, TokenBlacklist  # noqa: F401
 from app.models.email_token import EmailToken  # noqa: F401
+from app.models.email_outbox import EmailOutbox  # noqa: F401
 
 config = context.config
 
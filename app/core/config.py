@@ -1,6 +1,6 @@
-from pydantic_settings import BaseSettings, SettingsConfigDict
+from pydantic_settings import BaseSettings, NoDecode, SettingsConfigDict
 from pydantic import AnyUrl, field_validator
-from typing import List
+from typing import Annotated, List
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
@@ -14,21 +14,143 @@ class Settings(BaseSettings):
     ENV: str = "dev"
 
     DATABASE_URL: str
+    # async mode: asyncpg/aiosqlite engine, derived from DATABASE_URL unless set
+    DB_ASYNC: bool = False
+    ASYNC_DATABASE_URL: str | None = None
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800  # seconds, -1 disables
+    DB_POOL_PRE_PING: bool = True  # one extra round trip per checkout; rely on recycle when off
+    # read replicas (comma-separated URLs) for lookups marked read-only; a replica that
+    # fails to connect is skipped for DATABASE_REPLICA_EJECT_SECONDS
+    DATABASE_REPLICA_URLS: Annotated[List[str], NoDecode] = []
+    DATABASE_REPLICA_EJECT_SECONDS: float = 30.0
 
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str = "HS256"
+    # RS256/ES256/EdDSA: directory of <kid>.pem keys and the kid used for signing
+    JWT_KEYS_DIR: str | None = None
+    JWT_ACTIVE_KID: str | None = None
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
     SECURITY_TOKEN_AUDIENCE: str = "auth:users"
+    # cache of verified token payloads in decode_jwt (entries expire with the token)
+    JWT_DECODE_CACHE_ENABLED: bool = True
+    JWT_DECODE_CACHE_SIZE: int = 10000
 
     CORS_ORIGINS: List[str] = []
     RATE_LIMIT_PER_MINUTE: int = 120
+    # memory:// is per process; sqlite:///path.db shares counters across workers on a host
+    RATE_LIMIT_STORAGE_URI: str = "memory://"
+    RATE_LIMIT_STRATEGY: str = "sliding-window-counter"
+    # sqlite store: how long a hit may wait for another worker's write lock, and whether
+    # the hit is then allowed (fail open) or refused with a 429 (fail closed)
+    RATE_LIMIT_STORE_BUSY_MS: int = 50
+    RATE_LIMIT_STORE_FAIL_OPEN: bool = True
+    RATE_LIMIT_LOGIN: str = "20/minute"
+    RATE_LIMIT_LOGIN_PER_EMAIL: str = "10/minute"
+    RATE_LIMIT_REGISTER: str = "10/minute"
+    RATE_LIMIT_REFRESH: str = "60/minute"
+    RATE_LIMIT_PASSWORD: str = "10/minute"  # change/forgot/reset password, verify email
 
-    @field_validator("CORS_ORIGINS", mode="before")
+    # Failed-login lockouts, checked before the user lookup and bcrypt
+    LOGIN_LOCKOUT_ENABLED: bool = True
+    LOGIN_LOCKOUT_STORAGE_URI: str = "memory://"  # or sqlite:///path.db to share across workers
+    LOGIN_LOCKOUT_THRESHOLD: int = 5  # failures per email before locking
+    LOGIN_LOCKOUT_IP_THRESHOLD: int = 50  # failures per client IP before locking
+    LOGIN_LOCKOUT_BASE_SECONDS: float = 30
+    LOGIN_LOCKOUT_MAX_SECONDS: float = 3600
+    LOGIN_LOCKOUT_WINDOW_SECONDS: float = 900
+    LOGIN_LOCKOUT_MAX_TRACKED: int = 100000
+
+    # Password hashing executor ("thread" or "process")
+    HASH_EXECUTOR: str = "thread"
+    HASH_WORKERS: int = 2
+    HASH_QUEUE_SIZE: int = 64
+    # bcrypt cost; scripts/calibrate_bcrypt.py picks one for this host. Hashes at any
+    # other cost are upgraded after the next successful login.
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_REHASH_ON_LOGIN: bool = True
+
+    # In-process token blacklist cache
+    REVOCATION_CACHE_ENABLED: bool = True
+    REVOCATION_CACHE_MAX_STALENESS_SECONDS: float = 2.0
+    # refreshes are incremental by created_at; this often the whole live blacklist is
+    # reloaded, which bounds how long a late-committed or clock-skewed row can be missed
+    REVOCATION_CACHE_FULL_REFRESH_SECONDS: float = 60.0
+
+    # In-process user-state cache for get_current_user. Another worker's logout-all,
+    # password change or deactivation reaches this one's cache within
+    # REVOCATION_CACHE_MAX_STALENESS_SECONDS (signalled through token_blacklist); with
+    # REVOCATION_CACHE_ENABLED off, old tokens can pass for up to USER_CACHE_TTL_SECONDS
+    USER_CACHE_ENABLED: bool = True
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: float = 30.0
+
+    # Background purge of expired token rows (or run scripts/purge_expired.py from cron)
+    RETENTION_ENABLED: bool = False
+    RETENTION_INTERVAL_SECONDS: float = 3600
+    RETENTION_BATCH_SIZE: int = 1000
+    RETENTION_BATCH_PAUSE_SECONDS: float = 0.05
+
+    # bulk user import (POST /users/import, scripts/import_users.py); passwords are
+    # hashed in a separate process pool so imports never hold the login hashing pool
+    USER_IMPORT_BATCH_SIZE: int = 1000
+    USER_IMPORT_HASH_WORKERS: int = 2  # processes per app worker; scripts/import_users.py defaults to the CPU count
+    USER_IMPORT_MAX_ERRORS: int = 1000  # per-row errors kept in the report
+
+    # shared secret gateways send as X-Introspection-Token to POST /auth/introspect; unset disables it
+    INTROSPECTION_TOKEN: str | None = None
+
+    # /internal/stats and /metrics require this token as X-Internal-Token; unset, they answer 403
+    INTERNAL_STATS_ENABLED: bool = True
+    INTERNAL_STATS_TOKEN: str | None = None
+
+    # transactional email: rows are queued in email_outbox with their token's jti and sent
+    # by a background worker; without SMTP_HOST messages are only logged, which is refused
+    # unless ENV is dev/development/test (the worker fails to start). With the worker off,
+    # mail is still queued: run scripts/send_outbox.py (--loop, or from cron) to send it
+    EMAIL_OUTBOX_ENABLED: bool = True
+    EMAIL_OUTBOX_POLL_SECONDS: float = 2.0
+    EMAIL_OUTBOX_BATCH_SIZE: int = 50
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 5
+    EMAIL_OUTBOX_BACKOFF_SECONDS: float = 30.0
+    EMAIL_FROM: str = "no-reply@localhost"
+    SMTP_HOST: str | None = None
+    SMTP_PORT: int = 587
+    SMTP_USERNAME: str | None = None
+    SMTP_PASSWORD: str | None = None
+    SMTP_STARTTLS: bool = True
+    SMTP_TIMEOUT: float = 10.0
+
+    # Prometheus /metrics (request, hash/sign/verify and DB query timings); shares INTERNAL_STATS_TOKEN
+    METRICS_ENABLED: bool = True
+
+    @field_validator("CORS_ORIGINS", "DATABASE_REPLICA_URLS", mode="before")
     @classmethod
     def split_origins(cls, v):
         if isinstance(v, str):
             return [s.strip() for s in v.split(",") if s.strip()]
         return v
 
-settings = Settings()  # import this anywhere
+_current: Settings | None = None
+
+def get_settings() -> Settings:
+    global _current
+    if _current is None:
+        _current = Settings()
+    return _current
+
+def configure_settings(new: Settings):
+    """Install `new` as the process settings (create_app does this when given settings)."""
+    global _current
+    _current = new
+
+class _SettingsProxy:
+    # Settings() reads the environment and requires DATABASE_URL, so it is built on
+    # first attribute access rather than when a module imports `settings`
+    def __getattr__(self, name):
+        return getattr(get_settings(), name)
+
+settings = _SettingsProxy()  # import this anywhere
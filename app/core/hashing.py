@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.lazy import Lazy
+
+
+class HashingPool:
+    """Dedicated executor for KDF work so bcrypt never runs on the request threadpool."""
+
+    def __init__(self, kind: str, workers: int, queue_size: int):
+        self.kind = kind
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor: Executor | None = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="kdf")
+        return self._executor
+
+    def _reserve(self):
+        with self._lock:
+            if self._pending >= self.workers + self.queue_size:
+                self._rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail={"code": "hashing_overloaded", "message": "Server busy, try again shortly."},
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+            self._submitted += 1
+
+    def _release(self, started: float):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+            self._latency_total += elapsed
+            if elapsed > self._latency_max:
+                self._latency_max = elapsed
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        self._reserve()
+        started = time.perf_counter()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._release(started)
+            raise
+        # the slot is freed when the job itself ends: a cancelled request stops waiting,
+        # but a hash that already started keeps its worker busy until it finishes
+        future.add_done_callback(lambda _: self._release(started))
+        return await asyncio.wrap_future(future)
+
+    def has_capacity(self) -> bool:
+        # true when a job would start immediately instead of queueing behind others
+        with self._lock:
+            return self._pending < self.workers
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "queue_depth": max(self._pending - self.workers, 0),
+                "in_flight": self._pending,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "latency_avg_ms": (self._latency_total / self._completed * 1000) if self._completed else 0.0,
+                "latency_max_ms": self._latency_max * 1000,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+hashing_pool = Lazy(lambda: HashingPool(settings.HASH_EXECUTOR, settings.HASH_WORKERS, settings.HASH_QUEUE_SIZE), close=HashingPool.shutdown)
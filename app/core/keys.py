@@ -0,0 +1,92 @@
+import threading
+from pathlib import Path
+from typing import Any
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+
+from app.core.config import settings
+from app.core.lazy import Lazy
+from app.core.token_cache import token_cache
+
+SYMMETRIC_ALGORITHMS = {"HS256", "HS384", "HS512"}
+
+
+class KeyRing:
+    """Parsed signing/verification keys for asymmetric JWT algorithms.
+
+    Every `<kid>.pem` in JWT_KEYS_DIR is loaded once: private keys can sign and
+    verify, public-only files verify (keys being rotated out). JWT_ACTIVE_KID
+    picks the signing key. Parsed key objects and the JWKS document are cached
+    so decoding never touches PEM material again until `reload()`.
+    """
+
+    def __init__(self, algorithm: str, keys_dir: str | None, active_kid: str | None):
+        self.algorithm = algorithm
+        self.keys_dir = keys_dir
+        self.active_kid = active_kid
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._private: dict[str, Any] = {}
+        self._public: dict[str, Any] = {}
+        self._jwks: dict | None = None
+
+    @property
+    def asymmetric(self) -> bool:
+        return self.algorithm not in SYMMETRIC_ALGORITHMS
+
+    def _load(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if not self.keys_dir:
+                raise RuntimeError(f"JWT_KEYS_DIR is required for {self.algorithm}")
+            private, public = {}, {}
+            for path in sorted(Path(self.keys_dir).glob("*.pem")):
+                data = path.read_bytes()
+                if b"PRIVATE KEY" in data:
+                    private[path.stem] = serialization.load_pem_private_key(data, password=None)
+                    public[path.stem] = private[path.stem].public_key()
+                else:
+                    public[path.stem] = serialization.load_pem_public_key(data)
+            kid = self.active_kid or (sorted(private)[-1] if private else None)
+            if kid not in private:
+                raise RuntimeError(f"No private key for active kid {kid!r} in {self.keys_dir}")
+            algo = jwt.get_algorithm_by_name(self.algorithm)
+            jwks = []
+            for k, key in public.items():
+                jwk = algo.to_jwk(key, as_dict=True)
+                jwk.update({"kid": k, "alg": self.algorithm, "use": "sig"})
+                jwks.append(jwk)
+            self._private, self._public, self.active_kid = private, public, kid
+            self._jwks = {"keys": jwks}
+            self._loaded = True
+
+    def reload(self):
+        with self._lock:
+            self._loaded = False
+        self._load()
+        # tokens verified with a key that is gone must not keep passing from cache
+        token_cache.clear()
+
+    def signing_key(self) -> tuple[str, Any]:
+        self._load()
+        return self.active_kid, self._private[self.active_kid]
+
+    def verification_key(self, kid: str | None) -> Any:
+        self._load()
+        key = self._public.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown key id {kid!r}")
+        return key
+
+    def jwks(self) -> dict:
+        if not self.asymmetric:
+            return {"keys": []}
+        self._load()
+        return self._jwks
+
+
+keyring = Lazy(lambda: KeyRing(settings.JWT_ALGORITHM, settings.JWT_KEYS_DIR, settings.JWT_ACTIVE_KID))
@@ -0,0 +1,55 @@
+import threading
+from typing import Any, Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+_UNSET = object()
+_registry: list["Lazy"] = []
+
+
+class Lazy(Generic[T]):
+    """Module-level singleton that is built on first use instead of at import.
+
+    Attribute access and calls are forwarded to the instance, so call sites keep
+    using `hashing_pool.run(...)` etc. `reset_all()` drops every built instance
+    (running `close` on it) and the next use rebuilds it from current settings.
+    """
+
+    __slots__ = ("_factory", "_close", "_instance", "_lock")
+
+    def __init__(self, factory: Callable[[], T], close: Callable[[T], Any] | None = None):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_close", close)
+        object.__setattr__(self, "_instance", _UNSET)
+        object.__setattr__(self, "_lock", threading.Lock())
+        _registry.append(self)
+
+    def resolve(self) -> T:
+        instance = self._instance
+        if instance is _UNSET:
+            with self._lock:
+                if self._instance is _UNSET:
+                    object.__setattr__(self, "_instance", self._factory())
+                instance = self._instance
+        return instance
+
+    def reset(self):
+        with self._lock:
+            instance = self._instance
+            object.__setattr__(self, "_instance", _UNSET)
+        if instance is not _UNSET and self._close is not None:
+            self._close(instance)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.resolve(), name)
+
+    def __setattr__(self, name: str, value: Any):
+        setattr(self.resolve(), name, value)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self.resolve()(*args, **kwargs)
+
+
+def reset_all():
+    for lazy in _registry:
+        lazy.reset()
@@ -0,0 +1,166 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs: Iterable[tuple[str, str]]) -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in pairs]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.label_names = tuple(labels)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0.0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(zip(self.label_names, labels))} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, labels: Iterable[str] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.label_names = tuple(labels)
+        self.buckets = buckets
+        # label values -> ([per-bucket counts..., +Inf], [sum]); cumulated only at scrape time
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][i] += 1
+            series[1][0] += value
+
+    def count(self, *labels: str) -> int:
+        with self._lock:
+            series = self._series.get(labels)
+            return sum(series[0]) if series else 0
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        bounds = [repr(b) for b in self.buckets] + ["+Inf"]
+        with self._lock:
+            for labels, (counts, total) in sorted(self._series.items()):
+                pairs = list(zip(self.label_names, labels))
+                cumulative = 0
+                for le, count in zip(bounds, counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_labels(pairs + [('le', le)])} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(pairs)} {total[0]}")
+                lines.append(f"{self.name}_count{_labels(pairs)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """In-process metrics rendered in the Prometheus text exposition format.
+
+    Each worker process keeps its own series; scrape every worker (or run one
+    worker per container) rather than aggregating here.
+    """
+
+    def __init__(self):
+        self._metrics: list[Counter | Histogram] = []
+        self._gauges: dict[str, tuple[str, Callable[[], dict[tuple[tuple[str, str], ...], float]]]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.METRICS_ENABLED
+
+    def counter(self, name: str, doc: str, labels: Iterable[str] = ()) -> Counter:
+        metric = Counter(name, doc, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, doc: str, labels: Iterable[str] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, doc, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, doc: str, collect: Callable[[], dict[tuple[tuple[str, str], ...], float]]):
+        # gauges are read from the existing stats() methods at scrape time, not on the request path
+        self._gauges[name] = (doc, collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, (doc, collect) in self._gauges.items():
+            lines += [f"# HELP {name} {doc}", f"# TYPE {name} gauge"]
+            for labels, value in collect().items():
+                if value is not None:
+                    lines.append(f"{name}{_labels(labels)} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_latency = registry.histogram("http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status"))
+stage_latency = registry.histogram("auth_stage_duration_seconds", "Latency of auth hot-path stages (hash, sign, verify).", ("stage",))
+db_queries = registry.counter("db_queries_total", "SQL statements executed.", ("operation",))
+db_query_latency = registry.histogram("db_query_duration_seconds", "SQL statement execution time.", ("operation",))
+
+
+@contextmanager
+def stage_timer(stage: str):
+    if not registry.enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_latency.observe(time.perf_counter() - started, stage)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["metrics_query_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("metrics_query_started", None)
+    if started is None:
+        return
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    db_queries.inc(operation)
+    db_query_latency.observe(time.perf_counter() - started, operation)
+
+
+def instrument_engine(engine: Engine):
+    """Count and time every statement on `engine` (use `async_engine.sync_engine` for async)."""
+    if not registry.enabled:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,182 @@
+import sqlite3
+import sys
+import threading
+import time
+
+from fastapi import HTTPException
+from limits import parse
+from limits.storage import SlidingWindowCounterSupport, Storage, storage_from_string
+from limits.storage.base import TimestampedSlidingWindow
+from slowapi import Limiter
+from slowapi.extension import STRATEGIES
+from slowapi.util import get_remote_address
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+busy_decisions = registry.counter(
+    "rate_limit_store_busy_total", "Rate-limit hits decided without the shared store (write lock busy), by decision.", ("decision",),
+)
+
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """`limits` storage backed by one SQLite file, shared by every worker on the host.
+
+    Usage: RATE_LIMIT_STORAGE_URI=sqlite:////var/run/authapi/ratelimit.db
+    Each check is a single IMMEDIATE transaction over primary-key rows, so workers
+    see one consistent counter without any external service.
+
+    Hits run on the event loop (slowapi checks limits synchronously), so waiting for
+    another worker's write lock is capped at `busy_timeout` seconds; past that the
+    hit is allowed (`fail_open`) or refused without touching the counters.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+    _PURGE_EVERY = 1000
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, busy_timeout: float = 0.05, fail_open: bool = True, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        # same convention as SQLAlchemy: sqlite:///relative.db, sqlite:////absolute.db
+        self.path = uri.split("://", 1)[1][1:]
+        self.fail_open = fail_open
+        self._lock = threading.Lock()
+        self._writes = 0
+        # setup may wait on other workers creating the file; per-hit waits are capped below
+        self._conn = sqlite3.connect(self.path or ":memory:", timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)")
+        self._conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout * 1000)}")
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _get(self, key: str, now: float) -> tuple[int, float]:
+        row = self._conn.execute("SELECT value, expires_at FROM counters WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] <= now:
+            return 0, 0.0
+        return row
+
+    def _incr(self, key: str, expiry: float, amount: int, now: float) -> int:
+        value, expires_at = self._get(key, now)
+        if value == 0:
+            expires_at = now + expiry
+        self._conn.execute(
+            "INSERT INTO counters (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (key, value + amount, expires_at),
+        )
+        self._writes += 1
+        if self._writes % self._PURGE_EVERY == 0:
+            self._conn.execute("DELETE FROM counters WHERE expires_at <= ?", (now,))
+        return value + amount
+
+    def _transaction(self, fn, *args, allowed, denied):
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError:
+                # still locked after busy_timeout: answer now rather than stall every request
+                busy_decisions.inc("allowed" if self.fail_open else "denied")
+                return allowed if self.fail_open else denied
+            try:
+                result = fn(*args)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        # a fixed-window hit is allowed while the returned count stays within the limit
+        return self._transaction(self._incr, key, expiry, amount, time.time(), allowed=0, denied=sys.maxsize)
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            return self._get(key, time.time())[0]
+
+    def get_expiry(self, key: str) -> float:
+        with self._lock:
+            return self._get(key, time.time())[1] or time.time()
+
+    def check(self) -> bool:
+        try:
+            with self._lock:
+                self._conn.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int | None:
+        with self._lock:
+            return self._conn.execute("DELETE FROM counters").rowcount
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM counters WHERE key = ?", (key,))
+
+    def _window(self, key: str, expiry: int, now: float) -> tuple[int, float, int, float]:
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        previous_count = self._get(previous_key, now)[0]
+        current_count = self._get(current_key, now)[0]
+        previous_ttl = 0.0 if previous_count == 0 else (1 - (((now - expiry) / expiry) % 1)) * expiry
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def _acquire(self, key: str, limit: int, expiry: int, amount: int, now: float) -> bool:
+        previous_count, previous_ttl, current_count, _ = self._window(key, expiry, now)
+        if int(previous_count * previous_ttl / expiry + current_count) + amount > limit:
+            return False
+        # the check and the increment share one write transaction, so no revert is needed
+        self._incr(self.sliding_window_keys(key, expiry, now)[1], 2 * expiry, amount, now)
+        return True
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        return self._transaction(self._acquire, key, limit, expiry, amount, time.time(), allowed=True, denied=False)
+
+    def get_sliding_window(self, key: str, expiry: int) -> tuple[int, float, int, float]:
+        with self._lock:
+            return self._window(key, expiry, time.time())
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        for k in self.sliding_window_keys(key, expiry, time.time()):
+            self.clear(k)
+
+
+class AppLimiter(Limiter):
+    """slowapi Limiter whose storage is chosen by create_app() instead of at import.
+
+    Route decorators need the limiter when routers are imported, before settings
+    are known, so it starts on in-memory storage and `configure()` swaps in the
+    configured storage and strategy. Limit strings are callables read per request.
+    """
+
+    def configure(self, storage_uri: str, strategy: str):
+        self._storage_uri = storage_uri
+        self._strategy = strategy
+        options = {}
+        if storage_uri.startswith("sqlite://"):
+            options = {"busy_timeout": settings.RATE_LIMIT_STORE_BUSY_MS / 1000, "fail_open": settings.RATE_LIMIT_STORE_FAIL_OPEN}
+        self._storage = storage_from_string(storage_uri, **options)
+        self._limiter = STRATEGIES[strategy](self._storage)
+
+
+limiter = AppLimiter(
+    key_func=get_remote_address,
+    default_limits=[lambda: f"{settings.RATE_LIMIT_PER_MINUTE}/minute"],
+    storage_uri="memory://",
+)
+
+
+def hit_account_limit(scope: str, identifier: str, limit: str):
+    """Count one attempt against a non-IP key (e.g. the login email); 429 once over `limit`."""
+    item = parse(limit)
+    if not limiter.limiter.hit(item, scope, identifier.strip().lower()):
+        raise HTTPException(
+            status_code=429,
+            detail={"code": "rate_limited", "message": "Too many requests"},
+            headers={"Retry-After": str(item.get_expiry())},
+        )
@@ -1,14 +1,25 @@
 import re
+import time
 import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Any, Dict
 
 import jwt
-from passlib.context import CryptContext
 from fastapi import HTTPException, status
 from app.core.config import settings
+from app.core.hashing import hashing_pool
+from app.core.keys import keyring
+from app.core.lazy import Lazy
+from app.core.metrics import stage_timer
+from app.core.token_cache import token_cache
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def _bcrypt_context(rounds: int):
+    # passlib (and the bcrypt backend) load on first hash, not when this module is imported
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+# an explicit cost makes needs_update() flag hashes made at any other cost
+pwd_context = Lazy(lambda: _bcrypt_context(settings.BCRYPT_ROUNDS))
 
 PASSWORD_RE = re.compile(r"^(?=.*[A-Z])(?=.*[a-z])(?=.*\d)(?=.{8,})")
 
@@ -18,6 +29,48 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, hashed: str) -> bool:
     return pwd_context.verify(password, hashed)
 
+def password_needs_rehash(hashed: str) -> bool:
+    return pwd_context.needs_update(hashed)
+
+def bcrypt_cost(hashed: str) -> int | None:
+    # $2b$12$<salt+digest>
+    parts = hashed.split("$")
+    return int(parts[2]) if len(parts) > 3 and parts[2].isdigit() else None
+
+def target_bcrypt_rounds() -> int:
+    return pwd_context.handler("bcrypt").default_rounds
+
+def time_bcrypt_rounds(rounds: int, samples: int = 3) -> float:
+    """Median seconds to verify a password hashed at `rounds` on this host."""
+    ctx = _bcrypt_context(rounds)
+    hashed = ctx.hash("calibration-Passw0rd")
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        ctx.verify("calibration-Passw0rd", hashed)
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[len(timings) // 2]
+
+def calibrate_bcrypt_rounds(target_seconds: float, min_rounds: int = 10, max_rounds: int = 16, samples: int = 3) -> tuple[int, dict[int, float]]:
+    """Highest cost whose verify time stays within `target_seconds` (never below `min_rounds`)."""
+    timings: dict[int, float] = {}
+    chosen = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        timings[rounds] = time_bcrypt_rounds(rounds, samples)
+        if timings[rounds] > target_seconds:
+            break  # each extra round doubles the cost, no point measuring further
+        chosen = rounds
+    return chosen, timings
+
+# timed here rather than inside the KDF so process-pool workers are covered (includes queue wait)
+async def hash_password_async(password: str) -> str:
+    with stage_timer("hash_password"):
+        return await hashing_pool.run(hash_password, password)
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    with stage_timer("verify_password"):
+        return await hashing_pool.run(verify_password, password, hashed)
+
 def validate_password_rules(password: str):
     if not PASSWORD_RE.match(password):
         raise HTTPException(
@@ -28,28 +81,50 @@ def validate_password_rules(password: str):
 def _now() -> datetime:
     return datetime.now(timezone.utc)
 
-def create_jwt_token(subject: str, token_type: str, minutes: int | None = None, days: int | None = None, extra_claims: Dict[str, Any] | None = None) -> dict:
+def create_jwt_token(subject: str, token_type: str, minutes: int | None = None, days: int | None = None, extra_claims: Dict[str, Any] | None = None, jti: str | None = None, expires_at: datetime | None = None) -> dict:
     iat = _now()
-    exp = iat + (timedelta(minutes=minutes) if minutes else timedelta(days=days or 0))
-    jti = uuid.uuid4().hex
+    exp = expires_at or iat + (timedelta(minutes=minutes) if minutes else timedelta(days=days or 0))
+    jti = jti or uuid.uuid4().hex
     payload = {
         "sub": subject,
         "jti": jti,
         "type": token_type,
         "aud": settings.SECURITY_TOKEN_AUDIENCE,
         "iat": int(iat.timestamp()),
+        # iat is whole seconds; revocation watermarks need to order tokens within a second
+        "iat_ms": int(iat.timestamp() * 1000),
         "nbf": int(iat.timestamp()),
         "exp": int(exp.timestamp()),
     }
     if extra_claims:
         payload.update(extra_claims)
-    token = jwt.encode(payload, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    with stage_timer("jwt_sign"):
+        if keyring.asymmetric:
+            kid, key = keyring.signing_key()
+            token = jwt.encode(payload, key, algorithm=settings.JWT_ALGORITHM, headers={"kid": kid})
+        else:
+            token = jwt.encode(payload, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     return {"token": token, "jti": jti, "exp": exp}
 
 def decode_jwt(token: str) -> dict:
-    return jwt.decode(
-        token,
-        settings.JWT_SECRET_KEY,
-        algorithms=[settings.JWT_ALGORITHM],
-        audience=settings.SECURITY_TOKEN_AUDIENCE
-    )
+    if token_cache.enabled:
+        cache_key = token_cache.key(token)
+        payload = token_cache.get(cache_key)
+        if payload is None:
+            payload = _verify_jwt(token)
+            token_cache.put(cache_key, payload)
+        return payload
+    return _verify_jwt(token)
+
+def _verify_jwt(token: str) -> dict:
+    with stage_timer("jwt_verify"):
+        if keyring.asymmetric:
+            key = keyring.verification_key(jwt.get_unverified_header(token).get("kid"))
+        else:
+            key = settings.JWT_SECRET_KEY
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[settings.JWT_ALGORITHM],
+            audience=settings.SECURITY_TOKEN_AUDIENCE
+        )
@@ -0,0 +1,60 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+from app.core.lazy import Lazy
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of verified JWT payloads keyed by a hash of the token.
+
+    An entry is only served until the token's own exp, so a hit is never valid
+    for longer than a full verification would be.
+    """
+
+    def __init__(self, enabled: bool, max_size: int):
+        self.enabled = enabled
+        self.max_size = max_size
+        self._entries: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, key: bytes) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, key: bytes, payload: dict):
+        exp = payload.get("exp")
+        if exp is None:
+            return
+        with self._lock:
+            self._entries[key] = (float(exp), dict(payload))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"enabled": self.enabled, "size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+token_cache = Lazy(lambda: VerifiedTokenCache(settings.JWT_DECODE_CACHE_ENABLED, settings.JWT_DECODE_CACHE_SIZE))
@@ -0,0 +1,82 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+
+class PoolMetrics:
+    """Checkout wait, in-use/overflow counts and connection age for one engine's pool."""
+
+    def __init__(self, engine: Engine):
+        self.pool = engine.pool
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._age_max = 0.0
+
+        event.listen(self.pool, "connect", self._on_connect)
+        event.listen(self.pool, "checkout", self._on_checkout)
+        event.listen(self.pool, "checkin", self._on_checkin)
+
+        # time the blocking part of checkout; the pool has no event for "waiting"
+        do_get = self.pool._do_get
+
+        def _timed_do_get():
+            started = time.perf_counter()
+            try:
+                return do_get()
+            except PoolTimeoutError:
+                with self._lock:
+                    self.timeouts += 1
+                raise
+            finally:
+                waited = time.perf_counter() - started
+                with self._lock:
+                    self._wait_total += waited
+                    if waited > self._wait_max:
+                        self._wait_max = waited
+
+        self.pool._do_get = _timed_do_get
+
+    def _on_connect(self, dbapi_conn, record):
+        record.info["created_at"] = time.monotonic()
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_conn, record, proxy):
+        age = time.monotonic() - record.info.get("created_at", time.monotonic())
+        with self._lock:
+            self.checkouts += 1
+            if age > self._age_max:
+                self._age_max = age
+
+    def _on_checkin(self, dbapi_conn, record):
+        with self._lock:
+            self.checkins += 1
+
+    def _pool_value(self, name: str):
+        # only QueuePool-style pools expose these as methods
+        fn = getattr(self.pool, name, None)
+        return fn() if callable(fn) else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = self.checkouts + self.timeouts
+            return {
+                "pool": type(self.pool).__name__,
+                "size": self._pool_value("size"),
+                "in_use": self.checkouts - self.checkins,
+                "overflow": self._pool_value("overflow"),
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": (self._wait_total / waits * 1000) if waits else 0.0,
+                "wait_max_ms": self._wait_max * 1000,
+                "connection_age_max_s": self._age_max,
+            }
@@ -0,0 +1,123 @@
+import itertools
+import threading
+import time
+from functools import partial
+from typing import Any, Callable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.orm import Session
+
+from app.core.metrics import registry
+
+replica_ejections = registry.counter("db_replica_ejections_total", "Read replicas taken out of rotation after a connection error.", ("replica",))
+
+
+class ReplicaSet:
+    """Round-robin over read-replica engines.
+
+    A replica whose connection fails is ejected for `eject_seconds`; when every
+    replica is ejected `choose()` returns None and reads go to the primary.
+    """
+
+    def __init__(self, engines: list[tuple[str, Engine]], eject_seconds: float, owners: list[Any] | None = None):
+        self.engines = engines
+        self.eject_seconds = eject_seconds
+        # AsyncEngines wrapping `engines`, disposed from the event loop
+        self.owners = owners or []
+        self._ejected_until: dict[str, float] = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        for name, engine in engines:
+            event.listen(engine, "handle_error", partial(self._on_error, name))
+
+    def choose(self) -> Engine | None:
+        now = time.monotonic()
+        with self._lock:
+            start = next(self._counter)
+            for i in range(len(self.engines)):
+                name, engine = self.engines[(start + i) % len(self.engines)]
+                if self._ejected_until.get(name, 0.0) <= now:
+                    return engine
+        return None
+
+    def eject(self, name: str):
+        with self._lock:
+            self._ejected_until[name] = time.monotonic() + self.eject_seconds
+        replica_ejections.inc(name)
+
+    def _on_error(self, name: str, context):
+        # connection-level failures only; a bad statement is not a sick replica
+        if context.is_disconnect or isinstance(context.sqlalchemy_exception, (OperationalError, InterfaceError)):
+            self.eject(name)
+
+    def dispose(self):
+        for _, engine in self.engines:
+            engine.dispose()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                name: {"healthy": self._ejected_until.get(name, 0.0) <= now, "ejected_for": max(0.0, self._ejected_until.get(name, 0.0) - now)}
+                for name, _ in self.engines
+            }
+
+
+class RoutingSession(Session):
+    """Session that sends reads marked with `info["read_only"]` to a replica.
+
+    Everything else uses the primary bind. Once the session flushes or runs a
+    non-SELECT statement it is pinned to the primary, so reads that follow a
+    write in the same request see that write. One replica is picked per session.
+    """
+
+    def __init__(self, *args: Any, replicas: ReplicaSet | None = None, **kw: Any):
+        super().__init__(*args, **kw)
+        self.replicas = replicas
+
+    def get_bind(self, mapper=None, **kw):
+        if self.replicas is not None and self.info.get("read_only") and not self.info.get("pinned"):
+            replica = self.info.get("replica") or self.replicas.choose()
+            if replica is not None:
+                self.info["replica"] = replica
+                return replica
+        return super().get_bind(mapper, **kw)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _pin_after_flush(session, flush_context):
+    session.info["pinned"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _pin_on_write(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["pinned"] = True
+
+
+def read_only(fn: Callable[..., Any], session: Session, *args: Any) -> Any:
+    """Run `fn(session, *args)` against a replica when the session has any.
+
+    A replica error is retried on the primary (the replica is already ejected by
+    then), and so is a None result: replication lag looks like a missing row.
+    """
+    if not isinstance(session, RoutingSession) or session.replicas is None:
+        return fn(session, *args)
+    session.info["read_only"] = True
+    try:
+        try:
+            result = fn(session, *args)
+        except DBAPIError:
+            if session.info.pop("replica", None) is None:
+                raise
+            session.rollback()
+            session.info["read_only"] = False
+            return fn(session, *args)
+        if result is None and session.info.get("replica") is not None:
+            session.info["read_only"] = False
+            return fn(session, *args)
+        return result
+    finally:
+        session.info["read_only"] = False
@@ -1,14 +1,183 @@
+from functools import partial
+from typing import Any, Callable
+
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
+from app.core.lazy import Lazy
+from app.core.metrics import instrument_engine
+from app.db.pool_metrics import PoolMetrics
+from app.db.replicas import ReplicaSet, RoutingSession, read_only as _read_only
+
+def pool_options(url: str) -> dict:
+    opts = {"pool_pre_ping": settings.DB_POOL_PRE_PING, "pool_recycle": settings.DB_POOL_RECYCLE}
+    # SQLite uses its own single-connection pools that reject sizing arguments
+    if not url.startswith("sqlite"):
+        opts.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+    return opts
+
+def async_database_url(url: str) -> str:
+    # map the sync driver onto its asyncio counterpart
+    for sync_prefix, async_prefix in (
+        ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("sqlite+pysqlite://", "sqlite+aiosqlite://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    ):
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
+
+# engines are created on first use, so importing this module needs no DATABASE_URL
+pool_metrics: dict[str, PoolMetrics] = {}
+
+def _build_engine() -> Engine:
+    engine = create_engine(settings.DATABASE_URL, future=True, **pool_options(settings.DATABASE_URL))
+    pool_metrics["sync"] = PoolMetrics(engine)
+    instrument_engine(engine)
+    return engine
+
+def _dispose_engine(engine: Engine):
+    pool_metrics.pop("sync", None)
+    engine.dispose()
+
+def _build_async_engine() -> AsyncEngine | None:
+    if not settings.DB_ASYNC:
+        return None
+    async_url = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+    async_engine = create_async_engine(async_url, **pool_options(async_url))
+    pool_metrics["async"] = PoolMetrics(async_engine.sync_engine)
+    instrument_engine(async_engine.sync_engine)
+    return async_engine
+
+def _build_replicas(use_async: bool) -> ReplicaSet | None:
+    engines, owners = [], []
+    for i, url in enumerate(settings.DATABASE_REPLICA_URLS):
+        name = f"{'async-' if use_async else ''}replica-{i}"
+        if use_async:
+            url = async_database_url(url)
+            owners.append(create_async_engine(url, **pool_options(url)))
+            engine = owners[-1].sync_engine
+        else:
+            engine = create_engine(url, future=True, **pool_options(url))
+        pool_metrics[name] = PoolMetrics(engine)
+        instrument_engine(engine)
+        engines.append((name, engine))
+    return ReplicaSet(engines, settings.DATABASE_REPLICA_EJECT_SECONDS, owners) if engines else None
+
+def _close_replicas(replicas: ReplicaSet | None, dispose: bool = True):
+    if replicas is None:
+        return
+    for name, _ in replicas.engines:
+        pool_metrics.pop(name, None)
+    if dispose:
+        replicas.dispose()
+
+# async pools can only be closed from the event loop: see dispose_async_engine
+_engine = Lazy(_build_engine, close=_dispose_engine)
+_async_engine = Lazy(_build_async_engine, close=lambda _: pool_metrics.pop("async", None))
+_replicas = Lazy(lambda: _build_replicas(False), close=_close_replicas)
+_async_replicas = Lazy(lambda: _build_replicas(True), close=partial(_close_replicas, dispose=False))
+
+def get_engine() -> Engine:
+    return _engine.resolve()
+
+def get_async_engine() -> AsyncEngine | None:
+    return _async_engine.resolve()
+
+async def dispose_async_engine():
+    async_engine = get_async_engine()
+    if async_engine is not None:
+        await async_engine.dispose()
+        replicas = _async_replicas.resolve()
+        for replica in replicas.owners if replicas else ():
+            await replica.dispose()
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, future=True)
+def get_replicas() -> ReplicaSet | None:
+    return _async_replicas.resolve() if settings.DB_ASYNC else _replicas.resolve()
 
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
+def _build_sessionmaker() -> sessionmaker:
+    # without DATABASE_REPLICA_URLS sessions are plain Sessions bound to the primary
+    replicas = _replicas.resolve()
+    routing = {"class_": RoutingSession, "replicas": replicas} if replicas else {}
+    return sessionmaker(bind=get_engine(), autocommit=False, autoflush=False, expire_on_commit=False, **routing)
 
-def get_db():
-    db = SessionLocal()
+def _build_async_sessionmaker() -> async_sessionmaker:
+    replicas = _async_replicas.resolve()
+    routing = {"sync_session_class": RoutingSession, "replicas": replicas} if replicas else {}
+    return async_sessionmaker(bind=get_async_engine(), autoflush=False, expire_on_commit=False, **routing)
+
+SessionLocal = Lazy(_build_sessionmaker)
+AsyncSessionLocal = Lazy(_build_async_sessionmaker)
+
+class LazySession:
+    """Request-scoped stand-in that builds the real Session/AsyncSession on first use.
+
+    A session only checks out a connection when it first executes, but building
+    and closing one still costs (a threadpool hop for sync sessions). Requests
+    rejected before any query, or served from the caches, skip all of it.
+    """
+
+    __slots__ = ("_factory", "session")
+
+    def __init__(self, factory: Callable[[], Session | AsyncSession]):
+        self._factory = factory
+        self.session: Session | AsyncSession | None = None
+
+    def resolve(self) -> Session | AsyncSession:
+        if self.session is None:
+            self.session = self._factory()
+        return self.session
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.resolve(), name)
+
+def resolve_session(db: Session | AsyncSession | LazySession) -> Session | AsyncSession:
+    return db.resolve() if isinstance(db, LazySession) else db
+
+def detached_session(db: Session | AsyncSession | LazySession) -> Session | AsyncSession:
+    # the request's session is closed once the response is sent; work that outlives
+    # it (background tasks, streamed responses) gets its own session on the same engine
+    db = resolve_session(db)
+    if isinstance(db, AsyncSession):
+        return AsyncSession(bind=db.bind, expire_on_commit=False)
+    return Session(bind=db.get_bind(), expire_on_commit=False)
+
+async def get_db():
+    # Routes depend on get_db; FastAPI caches it per request, so get_current_user,
+    # require_roles and the handler share one LazySession. Settings.DB_ASYNC picks
+    # the implementation per request, following the settings create_app() was given
+    db = LazySession(AsyncSessionLocal if settings.DB_ASYNC else SessionLocal)
     try:
         yield db
     finally:
-        db.close()
+        session = db.session
+        if isinstance(session, AsyncSession):
+            await session.close()
+        elif session is not None:
+            if session.in_transaction():
+                # close() rolls back on the connection: keep that off the event loop
+                await run_in_threadpool(session.close)
+            else:
+                session.close()
+
+async def run_db(db: Session | AsyncSession | LazySession, fn: Callable[..., Any], *args: Any, read_only: bool = False) -> Any:
+    """Run sync ORM code `fn(session, *args)` without blocking the event loop.
+
+    AsyncSession runs it on its own connection via run_sync (no thread needed);
+    a plain Session falls back to the threadpool. `read_only` lets a replica
+    serve it (see app.db.replicas); only mark lookups that tolerate replica lag.
+    """
+    db = resolve_session(db)
+    if read_only:
+        fn = partial(_read_only, fn)
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args)
+    return await run_in_threadpool(fn, db, *args)
@@ -1,35 +1,53 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.orm import Session
+import hmac
 import uuid
 
-from app.db.session import get_db
+from app.core.config import settings
+from app.db.session import get_db, run_db
 from app.core.security import decode_jwt
 from app.models.user import User, Role
-from app.models.token import TokenBlacklist
+from app.services.revocation import revocation_cache
+from app.services.user_cache import user_cache
+from app.services.auth import get_user, tokens_revoked
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 bearer_scheme = HTTPBearer(auto_error=False)  # for refresh via header too
 
-def get_current_user(db: Session = Depends(get_db), token: str | None = Depends(oauth2_scheme)) -> User:
+async def get_current_user(db: Session = Depends(get_db), token: str | None = Depends(oauth2_scheme)) -> User:
     if not token:
         raise HTTPException(status_code=401, detail={"code": "not_authenticated", "message": "Missing token."})
     payload = decode_jwt(token)
     if payload.get("type") != "access":
         raise HTTPException(status_code=401, detail={"code": "wrong_token_type", "message": "Access token required."})
     # blacklist check
-    black = db.query(TokenBlacklist).filter(TokenBlacklist.jti == payload["jti"]).first()
-    if black:
+    if await revocation_cache.is_revoked_async(db, payload["jti"]):
         raise HTTPException(status_code=401, detail={"code": "token_revoked", "message": "Token revoked."})
-    user_id = payload.get("sub")
-    user = db.query(User).get(uuid.UUID(user_id))
+    user_id = uuid.UUID(payload.get("sub"))
+    user = user_cache.get(user_id, min_version=payload.get("ver", 0))
+    if user is None:
+        # the primary, not a replica: a lagging copy would bring back a revoked
+        # watermark or is_active for a whole USER_CACHE_TTL_SECONDS
+        user = await run_db(db, get_user, user_id)
+        if user:
+            user_cache.put(user)
     if not user or not user.is_active:
         raise HTTPException(status_code=403, detail={"code": "inactive_user", "message": "User is inactive."})
+    if tokens_revoked(payload, user):
+        raise HTTPException(status_code=401, detail={"code": "token_revoked", "message": "Token revoked."})
     return user
 
 def require_roles(*roles: Role):
-    def _dep(user: User = Depends(get_current_user)):
+    async def _dep(user: User = Depends(get_current_user)):
         if user.role not in roles:
             raise HTTPException(status_code=403, detail={"code": "insufficient_role", "message": "Insufficient permissions."})
         return user
     return _dep
+
+def require_introspection_client(token: str | None = Header(default=None, alias="X-Introspection-Token")):
+    # gateways authenticate with a shared token; without INTROSPECTION_TOKEN nobody may introspect
+    if not settings.INTROSPECTION_TOKEN:
+        raise HTTPException(status_code=403, detail={"code": "introspection_disabled", "message": "Introspection is not configured."})
+    if not hmac.compare_digest(token or "", settings.INTROSPECTION_TOKEN):
+        raise HTTPException(status_code=403, detail={"code": "forbidden", "message": "Invalid introspection token."})
@@ -1,52 +1,112 @@
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+
+import jwt
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.responses import Response
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+from starlette.responses import JSONResponse, Response
 from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
-
-from app.core.config import settings
-from app.routers import auth, users
 
-limiter = Limiter(key_func=get_remote_address, default_limits=[f"{settings.RATE_LIMIT_PER_MINUTE}/minute"])
+from app.core.config import Settings, configure_settings, settings
+from app.core.lazy import reset_all
+from app.core.rate_limit import limiter
+from app.middleware import MetricsMiddleware, RateLimitMiddleware, SecurityHeadersMiddleware
+from app.db.session import SessionLocal, dispose_async_engine
+from app.services.outbox import make_sender, outbox_loop
+from app.services.retention import retention_loop
+from app.routers import auth, users, internal, well_known
 
-app = FastAPI(title=settings.APP_NAME)
+logger = logging.getLogger(__name__)
 
-# CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.CORS_ORIGINS or ["http://localhost:3000"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = []
+    if settings.RETENTION_ENABLED:
+        tasks.append(asyncio.create_task(retention_loop(SessionLocal, settings.RETENTION_INTERVAL_SECONDS)))
+    if settings.EMAIL_OUTBOX_ENABLED:
+        tasks.append(asyncio.create_task(outbox_loop(SessionLocal, make_sender(), settings.EMAIL_OUTBOX_POLL_SECONDS)))
+    else:
+        # mail is still queued by every request that issues an email token
+        logger.warning("EMAIL_OUTBOX_ENABLED is off: queued email is only sent by scripts/send_outbox.py")
+    yield
+    for task in tasks:
+        task.cancel()
+    await dispose_async_engine()
+    # shuts down the hashing pool and disposes the sync engine, if they were ever used
+    reset_all()
 
-# Rate limiting
-app.state.limiter = limiter
-app.add_middleware(SlowAPIMiddleware)
+# rendered once: the body is the same for every rejected request
+RATE_LIMITED_BODY = json.dumps({"detail": {"code": "rate_limited", "message": "Too many requests"}}, separators=(",", ":")).encode()
 
-@app.exception_handler(RateLimitExceeded)
 def ratelimit_handler(request: Request, exc: RateLimitExceeded):
-    return Response(status_code=429, content='{"detail":{"code":"rate_limited","message":"Too many requests"}}', media_type="application/json")
-
-# Minimal security headers
-@app.middleware("http")
-async def security_headers(request: Request, call_next):
-    resp = await call_next(request)
-    resp.headers["X-Content-Type-Options"] = "nosniff"
-    resp.headers["X-Frame-Options"] = "DENY"
-    resp.headers["Referrer-Policy"] = "no-referrer"
-    resp.headers["Permissions-Policy"] = "geolocation=()"
-    # On production behind HTTPS, also set:
-    # resp.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-    return resp
-
-# Routers
-app.include_router(auth.router)
-app.include_router(users.router)
-
-# Health
-@app.get("/health")
+    return Response(status_code=429, content=RATE_LIMITED_BODY, media_type="application/json")
+
+def invalid_token_handler(request: Request, exc: jwt.InvalidTokenError):
+    # bad or expired bearer tokens are rejected here, before any DB session is built
+    if isinstance(exc, jwt.ExpiredSignatureError):
+        detail = {"code": "token_expired", "message": "Token expired."}
+    else:
+        detail = {"code": "invalid_token", "message": "Invalid token."}
+    return JSONResponse(status_code=401, content={"detail": detail}, headers={"WWW-Authenticate": "Bearer"})
+
+@limiter.exempt
 def health():
     return {"status": "ok"}
+
+def create_app(app_settings: Settings | None = None) -> FastAPI:
+    """Build the ASGI app.
+
+    Nothing is connected or hashed here: engines, the hashing pool, caches and
+    the CryptContext are process singletons built on first use from the active
+    settings, and are dropped here so a new app (e.g. one per test) starts clean.
+    """
+    if app_settings is not None:
+        configure_settings(app_settings)
+    reset_all()
+    limiter.configure(settings.RATE_LIMIT_STORAGE_URI, settings.RATE_LIMIT_STRATEGY)
+
+    app = FastAPI(title=settings.APP_NAME, lifespan=lifespan)
+
+    # CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.CORS_ORIGINS or ["http://localhost:3000"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Rate limiting
+    app.state.limiter = limiter
+    app.add_middleware(RateLimitMiddleware)
+    app.add_exception_handler(RateLimitExceeded, ratelimit_handler)
+    app.add_exception_handler(jwt.InvalidTokenError, invalid_token_handler)
+
+    # Minimal security headers (HSTS only in production, which is served over HTTPS)
+    app.add_middleware(SecurityHeadersMiddleware, hsts=settings.ENV in ("prod", "production"))
+
+    # Request latency histograms; added last so it is outermost and times the whole stack
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+
+    # Routers
+    app.include_router(auth.router)
+    app.include_router(users.router)
+    app.include_router(well_known.router)
+    if settings.INTERNAL_STATS_ENABLED:
+        app.include_router(internal.router)
+    if settings.METRICS_ENABLED:
+        app.include_router(internal.metrics_router)
+
+    # Health
+    app.add_api_route("/health", health, methods=["GET"])
+    return app
+
+def __getattr__(name: str):
+    # `uvicorn app.main:app` builds the app on first access; `uvicorn --factory app.main:create_app` also works
+    if name == "app":
+        app = globals()["app"] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
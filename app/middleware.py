@@ -0,0 +1,108 @@
+import time
+
+from slowapi.middleware import SlowAPIASGIMiddleware, _ASGIMiddlewareResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import request_latency
+
+BASE_SECURITY_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "Referrer-Policy": "no-referrer",
+    "Permissions-Policy": "geolocation=()",
+}
+HSTS_HEADER = ("Strict-Transport-Security", "max-age=31536000; includeSubDomains")
+
+
+class SecurityHeadersMiddleware:
+    """Pure ASGI middleware that adds security headers to every HTTP response.
+
+    Unlike @app.middleware("http") (BaseHTTPMiddleware) it spawns no task and
+    does not re-stream the body: it only rewrites the http.response.start
+    message, appending header bytes computed once at startup.
+    """
+
+    def __init__(self, app: ASGIApp, hsts: bool = False):
+        self.app = app
+        headers = dict(BASE_SECURITY_HEADERS)
+        if hsts:
+            headers[HSTS_HEADER[0]] = HSTS_HEADER[1]
+        self.raw_headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()]
+        self.names = {k for k, _ in self.raw_headers}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                headers = message.get("headers") or []
+                # same override semantics as setting resp.headers[...]
+                message["headers"] = [h for h in headers if h[0] not in self.names] + self.raw_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request latency per route template.
+
+    The route is read from the scope after routing, so /users/{id} is one
+    series regardless of the ids requested; unmatched paths share one label.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            request_latency.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                getattr(route, "path", "<unmatched>"),
+                str(status),
+            )
+
+
+# _ASGIMiddlewareResponder is private to slowapi, hence the exact pin in requirements.txt
+class _RateLimitResponder(_ASGIMiddlewareResponder):
+    async def send_wrapper(self, message: Message):
+        # slowapi holds http.response.start until the first body message, then re-sends it
+        # before every later one, which breaks streaming responses: forward those as-is
+        if self.initial_message is None:
+            await self.send(message)
+            return
+        await super().send_wrapper(message)
+        if message["type"] == "http.response.body":
+            self.initial_message = None
+
+
+class RateLimitMiddleware(SlowAPIASGIMiddleware):
+    """slowapi's pure ASGI limiter, fixed for responses sent in more than one body message.
+
+    SlowAPIMiddleware is a BaseHTTPMiddleware: every request pays for a task and a
+    re-streamed body. This checks limits and injects headers on the raw messages.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        await _RateLimitResponder(self.app)(scope, receive, send)
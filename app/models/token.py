@@ -10,11 +10,21 @@ class RefreshToken(Base):
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     jti: Mapped[str] = mapped_column(String(64), unique=True, nullable=False, index=True)
+    # indexed through ix_refresh_tokens_user_active (user_id leads), which also serves the ON DELETE CASCADE
     user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    parent_jti: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    parent_jti: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
+    # jti of the login that started this rotation chain; reuse revokes the whole family
+    family_id: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
     revoked: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
-    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    # session metadata, written by issue_tokens at login and on every rotation
+    user_agent: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    ip_address: Mapped[str | None] = mapped_column(String(45), nullable=True)
+    last_used_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+# a user's live sessions: WHERE user_id = ? AND revoked = false AND expires_at > now ORDER BY expires_at
+Index("ix_refresh_tokens_user_active", RefreshToken.user_id, RefreshToken.revoked, RefreshToken.expires_at)
 
 class TokenBlacklist(Base):
     __tablename__ = "token_blacklist"
@@ -22,7 +32,7 @@ class TokenBlacklist(Base):
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     jti: Mapped[str] = mapped_column(String(64), unique=True, nullable=False, index=True)
     reason: Mapped[str | None] = mapped_column(String(255), nullable=True)
-    expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
 
 Index("ix_blacklist_jti", TokenBlacklist.jti, unique=True)
@@ -3,35 +3,54 @@ from sqlalchemy.orm import Session
 from typing import Optional
 
 from app.db.session import get_db
-from app.schemas.auth import RegisterIn, LoginIn, TokenOut, RefreshIn, ChangePasswordIn, ForgotPasswordIn, ResetPasswordIn, VerifyEmailIn
+from app.schemas.auth import RegisterIn, LoginIn, TokenOut, RefreshIn, ChangePasswordIn, ForgotPasswordIn, ResetPasswordIn, VerifyEmailIn, IntrospectIn, IntrospectOut
 from app.schemas.user import UserOut
-from app.services.auth import register_user, login, refresh_tokens, logout, create_email_token, use_email_token
-from app.core.security import validate_password_rules, hash_password, verify_password
+from app.services.auth import (
+    register_user_async, login_async, refresh_tokens_async, logout_async, create_email_token_async,
+    get_user_async, get_user_by_email_async, save_user_async, reset_password_async, verify_email_async,
+    logout_all_async, revoke_all_tokens,
+)
+from app.services.introspection import introspect_tokens_async
+from app.core.security import validate_password_rules, hash_password_async, verify_password_async
 from app.models.email_token import EmailTokenPurpose
-from app.dependencies import bearer_scheme
+from app.dependencies import bearer_scheme, get_current_user, require_introspection_client
+from app.models.user import User
+from app.core.config import settings
+from app.core.rate_limit import limiter, hit_account_limit
+from slowapi.util import get_remote_address
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-@router.post("/register", response_model=UserOut, status_code=201)
-def register(payload: RegisterIn, db: Session = Depends(get_db)):
-    user = register_user(db, payload.email, payload.password, payload.full_name)
-    # auto-issue a verification email token (print/return via logs)
-    token = create_email_token(db, user, EmailTokenPurpose.verify_email)
-    print(f"[DEV ONLY] Email verification token for {user.email}:\n{token}")
-    return UserOut.from_orm_user(user)
-
-@router.post("/login", response_model=TokenOut)
-def login_route(payload: LoginIn, db: Session = Depends(get_db)):
-    t = login(db, payload.email, payload.password)
+def _token_out(t: dict) -> dict:
+    # a plain dict: response_model validates it in Rust faster than TokenOut.model_construct
+    # builds an instance (benchmarks/serialization.py), then dumps it straight to JSON bytes
     return {
         "access_token": t["access_token"],
         "refresh_token": t["refresh_token"],
         "token_type": "bearer",
-        "expires_in": 60 *  settings.ACCESS_TOKEN_EXPIRE_MINUTES,
+        "expires_in": 60 * settings.ACCESS_TOKEN_EXPIRE_MINUTES,
     }
 
+@router.post("/register", response_model=UserOut, status_code=201)
+@limiter.limit(lambda: settings.RATE_LIMIT_REGISTER)
+async def register(request: Request, payload: RegisterIn, db: Session = Depends(get_db)):
+    user = await register_user_async(db, payload.email, payload.password, payload.full_name)
+    # verification email is queued in the outbox and delivered in the background
+    await create_email_token_async(db, user, EmailTokenPurpose.verify_email)
+    return user
+
+@router.post("/login", response_model=TokenOut)
+@limiter.limit(lambda: settings.RATE_LIMIT_LOGIN)
+async def login_route(request: Request, payload: LoginIn, db: Session = Depends(get_db)):
+    # per-account budget on top of the per-IP one, so spreading IPs doesn't help
+    hit_account_limit("login", payload.email, settings.RATE_LIMIT_LOGIN_PER_EMAIL)
+    t = await login_async(db, payload.email, payload.password, get_remote_address(request), request.headers.get("user-agent"))
+    return _token_out(t)
+
 @router.post("/refresh", response_model=TokenOut)
-def refresh_route(
+@limiter.limit(lambda: settings.RATE_LIMIT_REFRESH)
+async def refresh_route(
+    request: Request,
     payload: RefreshIn,
     db: Session = Depends(get_db),
     authorization: Optional[str] = Header(default=None, alias="Authorization")
@@ -42,16 +61,11 @@ def refresh_route(
     if not token:
         raise HTTPException(status_code=400, detail={"code": "missing_refresh", "message": "Provide refresh token in body or Authorization header."})
 
-    t = refresh_tokens(db, token)
-    return {
-        "access_token": t["access_token"],
-        "refresh_token": t["refresh_token"],
-        "token_type": "bearer",
-        "expires_in": 60 * settings.ACCESS_TOKEN_EXPIRE_MINUTES,
-    }
+    t = await refresh_tokens_async(db, token, get_remote_address(request), request.headers.get("user-agent"))
+    return _token_out(t)
 
 @router.post("/logout", status_code=204)
-def logout_route(
+async def logout_route(
     db: Session = Depends(get_db),
     authorization: Optional[str] = Header(default=None, alias="Authorization"),
     refresh_auth: Optional[str] = Header(default=None, alias="X-Refresh-Token")
@@ -62,11 +76,19 @@ def logout_route(
         access_token = authorization.split(" ", 1)[1]
     if refresh_auth and refresh_auth.lower().startswith("bearer "):
         refresh_token = refresh_auth.split(" ", 1)[1]
-    logout(db, access_token, refresh_token)
+    await logout_async(db, access_token, refresh_token)
+    return
+
+@router.post("/logout-all", status_code=204)
+async def logout_all_route(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    # every access and refresh token issued so far stops working, on all devices
+    await logout_all_async(db, user)
     return
 
 @router.post("/change-password", status_code=204)
-def change_password(
+@limiter.limit(lambda: settings.RATE_LIMIT_PASSWORD)
+async def change_password(
+    request: Request,
     payload: ChangePasswordIn,
     db: Session = Depends(get_db),
     # use current access token to identify user
@@ -80,42 +102,44 @@ def change_password(
     if p.get("type") != "access":
         raise HTTPException(status_code=401, detail={"code": "wrong_token_type", "message": "Use access token."})
     import uuid
-    from app.models.user import User
-    user = db.query(User).get(uuid.UUID(p["sub"]))
+    user = await get_user_async(db, uuid.UUID(p["sub"]))
     if not user:
         raise HTTPException(status_code=404, detail={"code": "user_not_found", "message": "User not found."})
-    if not verify_password(payload.old_password, user.hashed_password):
+    if not await verify_password_async(payload.old_password, user.hashed_password):
         raise HTTPException(status_code=400, detail={"code": "bad_old_password", "message": "Old password incorrect."})
     validate_password_rules(payload.new_password)
-    user.hashed_password = hash_password(payload.new_password)
-    db.add(user)
-    db.commit()
+    user.hashed_password = await hash_password_async(payload.new_password)
+    # a changed password ends every existing session
+    revoke_all_tokens(user)
+    await save_user_async(db, user)
     return
 
 @router.post("/forgot-password", status_code=200)
-def forgot_password(payload: ForgotPasswordIn, db: Session = Depends(get_db)):
-    from app.models.user import User
-    user = db.query(User).filter(User.email == payload.email).first()
+@limiter.limit(lambda: settings.RATE_LIMIT_PASSWORD)
+async def forgot_password(request: Request, payload: ForgotPasswordIn, db: Session = Depends(get_db)):
+    user = await get_user_by_email_async(db, payload.email, read_only=True)
     # Do not leak user existence. Still generate a token if exists.
     if user:
-        token = create_email_token(db, user, EmailTokenPurpose.reset_password)
-        print(f"[DEV ONLY] Password reset token for {user.email}:\n{token}")
+        await create_email_token_async(db, user, EmailTokenPurpose.reset_password)
     return {"detail": "If the email exists, a reset link was issued."}
 
 @router.post("/reset-password", status_code=204)
-def reset_password(payload: ResetPasswordIn, db: Session = Depends(get_db)):
+@limiter.limit(lambda: settings.RATE_LIMIT_PASSWORD)
+async def reset_password(request: Request, payload: ResetPasswordIn, db: Session = Depends(get_db)):
     validate_password_rules(payload.new_password)
-    user = use_email_token(db, payload.token, EmailTokenPurpose.reset_password)
-    user.hashed_password = hash_password(payload.new_password)
-    db.add(user)
-    db.commit()
+    hashed = await hash_password_async(payload.new_password)
+    await reset_password_async(db, payload.token, hashed)
     return
 
 @router.post("/verify-email", status_code=204)
-def verify_email(payload: VerifyEmailIn, db: Session = Depends(get_db)):
-    user = use_email_token(db, payload.token, EmailTokenPurpose.verify_email)
-    from datetime import datetime
-    user.email_verified_at = datetime.utcnow()
-    db.add(user)
-    db.commit()
+@limiter.limit(lambda: settings.RATE_LIMIT_PASSWORD)
+async def verify_email(request: Request, payload: VerifyEmailIn, db: Session = Depends(get_db)):
+    await verify_email_async(db, payload.token)
     return
+
+# gateways call this at volume from few IPs, so the per-IP limit is lifted once
+# INTROSPECTION_TOKEN guards the route (without it every caller gets a 403)
+@router.post("/introspect", response_model=IntrospectOut, dependencies=[Depends(require_introspection_client)])
+@limiter.limit(lambda: f"{settings.RATE_LIMIT_PER_MINUTE}/minute", exempt_when=lambda: bool(settings.INTROSPECTION_TOKEN))
+async def introspect(request: Request, payload: IntrospectIn, db: Session = Depends(get_db)):
+    return {"results": await introspect_tokens_async(db, payload.tokens)}
@@ -0,0 +1,58 @@
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.core.config import settings
+from app.core.hashing import hashing_pool
+from app.core.metrics import registry
+from app.core.rate_limit import limiter
+from app.core.token_cache import token_cache
+from app.db.session import get_replicas, pool_metrics
+from app.services.revocation import revocation_cache
+from app.services.user_cache import user_cache
+
+router = APIRouter(prefix="/internal", tags=["internal"], include_in_schema=False)
+# mounted at the root: Prometheus scrapes /metrics by default
+metrics_router = APIRouter(tags=["internal"], include_in_schema=False)
+
+def _check_token(token: Optional[str]):
+    # fail closed: without INTERNAL_STATS_TOKEN the endpoints are mounted but refuse everyone
+    if not settings.INTERNAL_STATS_TOKEN:
+        raise HTTPException(status_code=403, detail={"code": "internal_token_unset", "message": "INTERNAL_STATS_TOKEN is not configured."})
+    if not hmac.compare_digest(token or "", settings.INTERNAL_STATS_TOKEN):
+        raise HTTPException(status_code=403, detail={"code": "forbidden", "message": "Invalid internal token."})
+
+@router.get("/stats")
+async def stats(x_internal_token: Optional[str] = Header(default=None, alias="X-Internal-Token")):
+    _check_token(x_internal_token)
+    replicas = get_replicas()
+    return {
+        "db_pool": {name: m.stats() for name, m in pool_metrics.items()},
+        "db_replicas": replicas.stats() if replicas else {},
+        "hashing": hashing_pool.stats(),
+        "jwt_decode_cache": token_cache.stats(),
+        "revocation_cache": revocation_cache.stats(),
+        "user_cache": user_cache.stats(),
+    }
+
+registry.gauge("hashing_in_flight", "KDF jobs running or queued.", lambda: {(): hashing_pool.stats()["in_flight"]})
+registry.gauge(
+    "db_pool_connections_in_use", "Connections checked out of the pool.",
+    lambda: {(("engine", name),): m.stats()["in_use"] for name, m in pool_metrics.items()},
+)
+registry.gauge(
+    "cache_entries", "Entries held by the in-process caches.",
+    lambda: {
+        (("cache", "jwt_decode"),): token_cache.stats().get("size"),
+        (("cache", "revocation"),): revocation_cache.stats().get("size"),
+        (("cache", "user"),): user_cache.stats().get("size"),
+    },
+)
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+@limiter.exempt
+async def metrics(x_internal_token: Optional[str] = Header(default=None, alias="X-Internal-Token")):
+    _check_token(x_internal_token)
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,15 +1,99 @@
-from fastapi import APIRouter, Depends
-from app.dependencies import get_current_user, require_roles
-from app.schemas.user import UserOut
+import io
+import json
+import uuid
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.security import decode_jwt
+from app.db.session import detached_session, get_db
+from app.dependencies import get_current_user, oauth2_scheme, require_roles
+from app.schemas.user import SessionPage, UserOut
+from app.models.token import RefreshToken
 from app.models.user import Role, User
+from app.services.sessions import list_sessions_async, revoke_session_async, session_id
+from app.services.user_import import UserImporter, read_rows
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 @router.get("/me", response_model=UserOut)
-def me(current: User = Depends(get_current_user)):
-    return UserOut.from_orm_user(current)
+async def me(current: User = Depends(get_current_user)):
+    return current
+
+def _session_page(rows: list[RefreshToken], next_cursor: str | None, current_family: str | None = None) -> dict:
+    items = [
+        {
+            "id": session_id(rt),
+            "user_agent": rt.user_agent,
+            "ip_address": rt.ip_address,
+            "last_used_at": rt.last_used_at,
+            "expires_at": rt.expires_at,
+            "current": current_family is not None and rt.family_id == current_family,
+        }
+        for rt in rows
+    ]
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.get("/me/sessions", response_model=SessionPage)
+async def my_sessions(
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current: User = Depends(get_current_user),
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+):
+    rows, next_cursor = await list_sessions_async(db, current.id, limit, cursor)
+    # already verified by get_current_user, so this is a token-cache hit
+    return _session_page(rows, next_cursor, decode_jwt(token).get("fam"))
+
+# ends the session's refresh chain; its access tokens expire on their own (ACCESS_TOKEN_EXPIRE_MINUTES)
+@router.delete("/me/sessions/{sid}", status_code=204)
+async def revoke_my_session(sid: str, current: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    await revoke_session_async(db, current.id, sid)
+
+@router.get("/{user_id}/sessions", response_model=SessionPage, dependencies=[Depends(require_roles(Role.admin))])
+async def user_sessions(
+    user_id: uuid.UUID,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    return _session_page(*await list_sessions_async(db, user_id, limit, cursor))
+
+@router.delete("/{user_id}/sessions/{sid}", status_code=204, dependencies=[Depends(require_roles(Role.admin))])
+async def revoke_user_session(user_id: uuid.UUID, sid: str, db: Session = Depends(get_db)):
+    await revoke_session_async(db, user_id, sid)
 
 # Example RBAC-protected route (admin only)
 @router.get("/admin/secret")
-def admin_secret(current: User = Depends(require_roles(Role.admin))):
+async def admin_secret(current: User = Depends(require_roles(Role.admin))):
     return {"message": f"Hello admin {current.email}!"}
+
+# streams one NDJSON line per batch ({"progress": ...}) and ends with {"report": ...}
+@router.post("/import", dependencies=[Depends(require_roles(Role.admin))])
+async def import_users(
+    file: UploadFile,
+    format: Optional[str] = Query(default=None, pattern="^(csv|jsonl)$"),
+    db: Session = Depends(get_db),
+):
+    fmt = format or ("csv" if (file.filename or "").lower().endswith(".csv") else "jsonl")
+    rows = read_rows(io.TextIOWrapper(file.file, encoding="utf-8-sig", newline=""), fmt)
+    session = detached_session(db)
+
+    async def stream():
+        importer = UserImporter()
+        try:
+            async for report in importer.run_async(session, rows):
+                counts = {k: v for k, v in report.items() if k not in ("errors", "errors_truncated")}
+                yield json.dumps({"progress": counts}) + "\n"
+            yield json.dumps({"report": importer.report}) + "\n"
+        finally:
+            if isinstance(session, AsyncSession):
+                await session.close()
+            else:
+                session.close()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
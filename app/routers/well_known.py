@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.core.keys import keyring
+
+router = APIRouter(prefix="/.well-known", tags=["well-known"])
+
+@router.get("/jwks.json")
+async def jwks():
+    # keys only change on rotation, let verifiers cache the document
+    return JSONResponse(keyring.jwks(), headers={"Cache-Control": "public, max-age=300"})
@@ -1,4 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from typing import Any
+
+from pydantic import BaseModel, EmailStr, Field
 
 class RegisterIn(BaseModel):
     email: EmailStr
@@ -31,3 +33,14 @@ class ResetPasswordIn(BaseModel):
 
 class VerifyEmailIn(BaseModel):
     token: str
+
+class IntrospectIn(BaseModel):
+    tokens: list[str] = Field(min_length=1, max_length=500)
+
+class IntrospectResult(BaseModel):
+    active: bool
+    claims: dict[str, Any] | None = None
+    reason: str | None = None  # why an inactive token was rejected
+
+class IntrospectOut(BaseModel):
+    results: list[IntrospectResult]  # same order as the request
@@ -1,4 +1,7 @@
-from pydantic import BaseModel, EmailStr
+import uuid
+from datetime import datetime
+
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator
 from typing import Optional
 from enum import Enum
 
@@ -13,19 +16,37 @@ class UserBase(BaseModel):
 class UserCreate(UserBase):
     password: str
 
+class UserImportRow(UserBase):
+    # one of password (hashed on import) or password_hash (an existing bcrypt hash)
+    password: Optional[str] = None
+    password_hash: Optional[str] = None
+    role: Role = Role.user
+    is_active: bool = True
+    email_verified: bool = False
+
 class UserOut(UserBase):
-    id: str
+    # validated once, straight from the ORM User (routes return the model itself)
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
+
+    email: str  # already validated when it was stored; skip email-validator on every response
+    id: uuid.UUID
     is_active: bool
     role: Role
-    email_verified: bool
+    email_verified: bool = Field(validation_alias="email_verified_at")
 
+    @field_validator("email_verified", mode="before")
     @classmethod
-    def from_orm_user(cls, u):
-        return cls(
-            id=str(u.id),
-            email=u.email,
-            full_name=u.full_name,
-            is_active=u.is_active,
-            role=u.role.value,
-            email_verified=bool(u.email_verified_at),
-        )
+    def verified_from_timestamp(cls, v):
+        return bool(v)
+
+class SessionOut(BaseModel):
+    id: str  # family id: stable across refresh-token rotations
+    user_agent: Optional[str] = None
+    ip_address: Optional[str] = None
+    last_used_at: Optional[datetime] = None  # the session's last login or refresh
+    expires_at: datetime
+    current: bool = False  # the session of the access token making this request
+
+class SessionPage(BaseModel):
+    items: list[SessionOut]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
@@ -1,39 +1,77 @@
 import uuid
 from datetime import datetime, timedelta, timezone
+from functools import partial
 from typing import Optional
 from fastapi import HTTPException, status
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.security import hash_password, verify_password, validate_password_rules, create_jwt_token, decode_jwt, _now
+from app.core.security import hash_password, verify_password, hash_password_async, verify_password_async, validate_password_rules, create_jwt_token, decode_jwt, _now
 from app.models.user import User, Role
 from app.models.token import RefreshToken, TokenBlacklist
 from app.models.email_token import EmailToken, EmailTokenPurpose
 from app.core.config import settings
+from app.db.session import run_db
+from app.services.revocation import revocation_cache, user_signal
+from app.services.user_cache import user_cache
+from app.services.lockout import login_tracker
+from app.services.outbox import enqueue_email
+from app.services.rehash import schedule_rehash
 
-def register_user(db: Session, email: str, password: str, full_name: Optional[str]) -> User:
-    validate_password_rules(password)
-    existing = db.query(User).filter(User.email == email).first()
-    if existing:
-        raise HTTPException(status_code=409, detail={"code": "email_taken", "message": "Email already registered."})
-    u = User(email=email, hashed_password=hash_password(password), full_name=full_name, role=Role.user)
+def _insert_user(db: Session, email: str, hashed_password: str, full_name: Optional[str]) -> User:
+    # the unique index on email is the existence check: one INSERT, one commit.
+    # Column defaults are applied client-side, so no refresh round trip is needed.
+    u = User(email=email, hashed_password=hashed_password, full_name=full_name, role=Role.user, is_active=True, token_version=0)
     db.add(u)
-    db.commit()
-    db.refresh(u)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail={"code": "email_taken", "message": "Email already registered."})
     return u
 
-def issue_tokens(db: Session, user: User, parent_refresh_jti: Optional[str] = None) -> dict:
-    access = create_jwt_token(str(user.id), "access", minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES, extra_claims={"role": user.role.value})
-    refresh = create_jwt_token(str(user.id), "refresh", days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+def register_user(db: Session, email: str, password: str, full_name: Optional[str]) -> User:
+    validate_password_rules(password)
+    return _insert_user(db, email, hash_password(password), full_name)
+
+async def register_user_async(db: Session | AsyncSession, email: str, password: str, full_name: Optional[str]) -> User:
+    # DB work goes through run_db, bcrypt goes to the hashing pool
+    validate_password_rules(password)
+    hashed = await hash_password_async(password)
+    return await run_db(db, _insert_user, email, hashed, full_name)
+
+def issue_tokens(
+    db: Session,
+    user: User,
+    parent_refresh_jti: Optional[str] = None,
+    commit: bool = True,
+    family_id: Optional[str] = None,
+    user_agent: Optional[str] = None,
+    ip_address: Optional[str] = None,
+) -> dict:
+    # a login starts a new family named after its first refresh jti; rotations inherit it.
+    # The access token carries it too, so /users/me/sessions can mark the caller's session
+    jti = uuid.uuid4().hex
+    family_id = family_id or jti
+    access = create_jwt_token(str(user.id), "access", minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES, extra_claims={"role": user.role.value, "ver": user.token_version, "fam": family_id})
+    refresh = create_jwt_token(str(user.id), "refresh", days=settings.REFRESH_TOKEN_EXPIRE_DAYS, extra_claims={"fam": family_id}, jti=jti)
     # store refresh token for rotation
     rt = RefreshToken(
         jti=refresh["jti"],
         user_id=user.id,
         parent_jti=parent_refresh_jti,
+        family_id=family_id,
         revoked=False,
         expires_at=refresh["exp"],
+        user_agent=user_agent[:255] if user_agent else None,
+        ip_address=ip_address,
+        last_used_at=_now(),
     )
     db.add(rt)
-    db.commit()
+    if commit:
+        db.commit()
     return {
         "access_token": access["token"],
         "refresh_token": refresh["token"],
@@ -42,53 +80,170 @@ def issue_tokens(db: Session, user: User, parent_refresh_jti: Optional[str] = No
         "access_exp": access["exp"],
     }
 
-def login(db: Session, email: str, password: str) -> dict:
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.hashed_password):
+def get_user_by_email(db: Session, email: str) -> User | None:
+    return db.query(User).filter(User.email == email).first()
+
+def _check_login(user: User | None, password_ok: bool):
+    if not user or not password_ok:
         raise HTTPException(status_code=401, detail={"code": "invalid_credentials", "message": "Invalid email or password."})
     if not user.is_active:
         raise HTTPException(status_code=403, detail={"code": "inactive_user", "message": "User is inactive."})
-    return issue_tokens(db, user)
 
-def refresh_tokens(db: Session, token_str: str) -> dict:
+def revoke_all_tokens(user: User):
+    # millisecond resolution, like the iat_ms claim it is compared with
+    now = _now()
+    user.tokens_valid_after = now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+def tokens_revoked(payload: dict, user: User) -> bool:
+    watermark = user.tokens_valid_after
+    if watermark is None:
+        return False
+    if watermark.tzinfo is None:  # SQLite hands back naive datetimes
+        watermark = watermark.replace(tzinfo=timezone.utc)
+    # a token minted in the watermark's own millisecond is revoked too: when the order
+    # is ambiguous, fail closed. Tokens from before iat_ms fall back to whole seconds
+    issued_ms = payload.get("iat_ms", payload.get("iat", 0) * 1000)
+    return issued_ms <= round(watermark.timestamp() * 1000)
+
+def get_user(db: Session, user_id: uuid.UUID) -> User | None:
+    return db.get(User, user_id)
+
+def save_user(db: Session, user: User):
+    # any change that affects auth state bumps the version and drops cached copies,
+    # here directly and on other workers through the signal row committed with it.
+    # `user` may be a snapshot from user_cache, so the bump is done in SQL: a copy
+    # older than another worker's write cannot move the version backwards
+    user.token_version = User.token_version + 1
+    db.add(user)
+    db.add(user_signal(user.id))
+    db.commit()
+    db.refresh(user, ["token_version"])
+    user_cache.invalidate(user.id)
+
+async def get_user_by_email_async(db: Session | AsyncSession, email: str, read_only: bool = False) -> User | None:
+    return await run_db(db, get_user_by_email, email, read_only=read_only)
+
+async def get_user_async(db: Session | AsyncSession, user_id: uuid.UUID) -> User | None:
+    return await run_db(db, get_user, user_id)
+
+async def save_user_async(db: Session | AsyncSession, user: User):
+    await run_db(db, save_user, user)
+
+def _record_login(email: str, client_ip: str | None, password_ok: bool):
+    if password_ok:
+        login_tracker.record_success(email)
+    else:
+        login_tracker.record_failure(email, client_ip)
+
+def login(db: Session, email: str, password: str, client_ip: str | None = None, user_agent: str | None = None) -> dict:
+    login_tracker.check(email, client_ip)
+    user = get_user_by_email(db, email)
+    password_ok = bool(user) and verify_password(password, user.hashed_password)
+    _record_login(email, client_ip, password_ok)
+    _check_login(user, password_ok)
+    return issue_tokens(db, user, user_agent=user_agent, ip_address=client_ip)
+
+async def login_async(db: Session | AsyncSession, email: str, password: str, client_ip: str | None = None, user_agent: str | None = None) -> dict:
+    # locked accounts/IPs are rejected before any DB or bcrypt work
+    await login_tracker.run_async(login_tracker.check, email, client_ip)
+    user = await run_db(db, get_user_by_email, email, read_only=True)
+    password_ok = bool(user) and await verify_password_async(password, user.hashed_password)
+    await login_tracker.run_async(_record_login, email, client_ip, password_ok)
+    _check_login(user, password_ok)
+    tokens = await run_db(db, partial(issue_tokens, user_agent=user_agent, ip_address=client_ip), user)
+    # outdated bcrypt cost: upgrade in the background, the response does not wait
+    schedule_rehash(db, user, password)
+    return tokens
+
+def refresh_tokens(db: Session, token_str: str, client_ip: str | None = None, user_agent: str | None = None) -> dict:
     payload = decode_jwt(token_str)
     if payload.get("type") != "refresh":
         raise HTTPException(status_code=400, detail={"code": "wrong_token_type", "message": "Expected refresh token."})
     jti = payload.get("jti")
-    user_id = payload.get("sub")
+    user_id = uuid.UUID(payload.get("sub"))
 
-    rt = db.query(RefreshToken).filter(RefreshToken.jti == jti).first()
-    if not rt or rt.revoked:
+    # rotate: revoke current and issue new in one transaction. The conditional UPDATE
+    # lets only one of several concurrent refreshes of the same jti win.
+    consumed = db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.jti == jti, RefreshToken.user_id == user_id, RefreshToken.revoked.is_(False), RefreshToken.expires_at > _now())
+        .values(revoked=True)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+    if not consumed:
+        db.rollback()
+        rt = db.query(RefreshToken).filter(RefreshToken.jti == jti).first()
+        if rt and not rt.revoked:
+            raise HTTPException(status_code=401, detail={"code": "refresh_expired", "message": "Refresh token expired."})
+        if rt:
+            # an already-rotated token came back: whoever holds its successor may be an
+            # attacker, so revoke the whole family with one indexed UPDATE
+            revoke_family(db, rt.family_id or payload.get("fam"), user_id)
         raise HTTPException(status_code=401, detail={"code": "refresh_revoked", "message": "Refresh token is invalidated."})
-    if rt.expires_at < _now():
-        raise HTTPException(status_code=401, detail={"code": "refresh_expired", "message": "Refresh token expired."})
 
-    user = db.query(User).get(uuid.UUID(user_id))
+    # not the per-process user cache: another worker's logout-all or password reset
+    # must stop this refresh, and the session is on the primary after the UPDATE
+    user = db.get(User, user_id)
     if not user or not user.is_active:
+        db.rollback()
         raise HTTPException(status_code=403, detail={"code": "inactive_user", "message": "User is inactive."})
+    if tokens_revoked(payload, user):
+        db.rollback()
+        raise HTTPException(status_code=401, detail={"code": "refresh_revoked", "message": "Refresh token is invalidated."})
+    # tokens minted before families existed carry no claim; their row was backfilled
+    family_id = payload.get("fam") or db.scalar(select(RefreshToken.family_id).where(RefreshToken.jti == jti))
+    tokens = issue_tokens(db, user, parent_refresh_jti=jti, commit=False, family_id=family_id, user_agent=user_agent, ip_address=client_ip)
+    db.commit()
+    return tokens
 
-    # rotate: revoke current, issue new
-    rt.revoked = True
-    db.add(rt)
+def revoke_family(db: Session, family_id: str | None, user_id: uuid.UUID) -> int:
+    if not family_id:
+        return 0
+    revoked = db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.user_id == user_id, RefreshToken.revoked.is_(False))
+        .values(revoked=True)
+        .execution_options(synchronize_session=False)
+    ).rowcount
     db.commit()
-    return issue_tokens(db, user, parent_refresh_jti=jti)
+    return revoked
+
+async def refresh_tokens_async(db: Session | AsyncSession, token_str: str, client_ip: str | None = None, user_agent: str | None = None) -> dict:
+    return await run_db(db, refresh_tokens, token_str, client_ip, user_agent)
 
 def logout(db: Session, access_token: str | None, refresh_token: str | None):
+    revoked_access = None
     # blacklist access token if provided
     if access_token:
         payload = decode_jwt(access_token)
         if payload.get("type") == "access":
-            db.add(TokenBlacklist(jti=payload["jti"], expires_at=datetime.fromtimestamp(payload["exp"], tz=timezone.utc), reason="logout"))
-            db.commit()
+            revoked_access = (payload["jti"], datetime.fromtimestamp(payload["exp"], tz=timezone.utc))
+            db.add(TokenBlacklist(jti=revoked_access[0], expires_at=revoked_access[1], reason="logout"))
     # revoke refresh token if provided
     if refresh_token:
         payload = decode_jwt(refresh_token)
         if payload.get("type") == "refresh":
-            rt = db.query(RefreshToken).filter(RefreshToken.jti == payload["jti"]).first()
-            if rt and not rt.revoked:
-                rt.revoked = True
-                db.add(rt)
-                db.commit()
+            db.execute(
+                update(RefreshToken)
+                .where(RefreshToken.jti == payload["jti"], RefreshToken.revoked.is_(False))
+                .values(revoked=True)
+                .execution_options(synchronize_session=False)
+            )
+    db.commit()
+    if revoked_access:
+        revocation_cache.add(*revoked_access)
+
+async def logout_async(db: Session | AsyncSession, access_token: str | None, refresh_token: str | None):
+    if access_token or refresh_token:
+        await run_db(db, logout, access_token, refresh_token)
+
+def logout_all(db: Session, user: User):
+    # one UPDATE on the user row replaces a blacklist row per live token
+    revoke_all_tokens(user)
+    save_user(db, user)
+
+async def logout_all_async(db: Session | AsyncSession, user: User):
+    await run_db(db, logout_all, user)
 
 def create_email_token(db: Session, user: User, purpose: EmailTokenPurpose, expires_in_minutes: int = 60) -> str:
     tok = create_jwt_token(str(user.id), "email", minutes=expires_in_minutes, extra_claims={"purpose": purpose.value})
@@ -100,21 +255,55 @@ def create_email_token(db: Session, user: User, purpose: EmailTokenPurpose, expi
         used=False
     )
     db.add(et)
+    # queued in the same transaction as the token; the outbox worker does the SMTP part
+    enqueue_email(db, user.email, purpose, tok["jti"], tok["exp"])
     db.commit()
-    # In a real app, send email here. For the tutorial we return the token so you can test.
     return tok["token"]
 
-def use_email_token(db: Session, token_str: str, expected_purpose: EmailTokenPurpose) -> User:
+async def create_email_token_async(db: Session | AsyncSession, user: User, purpose: EmailTokenPurpose, expires_in_minutes: int = 60) -> str:
+    return await run_db(db, create_email_token, user, purpose, expires_in_minutes)
+
+def use_email_token(db: Session, token_str: str, expected_purpose: EmailTokenPurpose, commit: bool = True) -> User:
     payload = decode_jwt(token_str)
     if payload.get("type") != "email" or payload.get("purpose") != expected_purpose.value:
         raise HTTPException(status_code=400, detail={"code": "invalid_email_token", "message": "Bad email token."})
-    et = db.query(EmailToken).filter(EmailToken.jti == payload["jti"]).first()
-    if not et or et.used or et.expires_at < _now():
+    # mark used only if still unused and unexpired, so a token can be redeemed once
+    consumed = db.execute(
+        update(EmailToken)
+        .where(EmailToken.jti == payload["jti"], EmailToken.purpose == expected_purpose, EmailToken.used.is_(False), EmailToken.expires_at > _now())
+        .values(used=True)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+    if not consumed:
+        db.rollback()
         raise HTTPException(status_code=400, detail={"code": "email_token_used_or_expired", "message": "Token invalid or expired."})
-    user = db.query(User).get(uuid.UUID(payload["sub"]))
+    user = db.get(User, uuid.UUID(payload["sub"]))
     if not user:
+        db.rollback()
         raise HTTPException(status_code=404, detail={"code": "user_not_found", "message": "User not found."})
-    et.used = True
-    db.add(et)
-    db.commit()
+    if commit:
+        db.commit()
+    return user
+
+def reset_password(db: Session, token_str: str, hashed_password: str) -> User:
+    # token consumption and the password write share one commit
+    user = use_email_token(db, token_str, EmailTokenPurpose.reset_password, commit=False)
+    user.hashed_password = hashed_password
+    revoke_all_tokens(user)
+    save_user(db, user)
     return user
+
+def verify_email(db: Session, token_str: str) -> User:
+    user = use_email_token(db, token_str, EmailTokenPurpose.verify_email, commit=False)
+    user.email_verified_at = datetime.utcnow()
+    save_user(db, user)
+    return user
+
+async def use_email_token_async(db: Session | AsyncSession, token_str: str, expected_purpose: EmailTokenPurpose) -> User:
+    return await run_db(db, use_email_token, token_str, expected_purpose)
+
+async def reset_password_async(db: Session | AsyncSession, token_str: str, hashed_password: str) -> User:
+    return await run_db(db, reset_password, token_str, hashed_password)
+
+async def verify_email_async(db: Session | AsyncSession, token_str: str) -> User:
+    return await run_db(db, verify_email, token_str)
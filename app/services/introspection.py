@@ -0,0 +1,60 @@
+import uuid
+
+import jwt
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.core.security import decode_jwt
+from app.db.session import run_db
+from app.models.user import User
+from app.services.auth import tokens_revoked
+from app.services.revocation import revocation_cache
+from app.services.user_cache import user_cache
+
+def _decode_batch(tokens: list[str]) -> list[dict]:
+    results = []
+    for token in tokens:
+        try:
+            payload = decode_jwt(token)
+        except jwt.InvalidTokenError:
+            results.append({"active": False, "reason": "invalid_token"})
+            continue
+        if payload.get("type") != "access":
+            results.append({"active": False, "reason": "wrong_token_type"})
+            continue
+        results.append({"active": True, "claims": payload})
+    return results
+
+def _resolve_batch(db: Session, results: list[dict]) -> list[dict]:
+    live = [r for r in results if r["active"]]
+    # one blacklist lookup and at most one users lookup for the whole batch
+    revoked = revocation_cache.revoked_among(db, [r["claims"]["jti"] for r in live])
+    users: dict[uuid.UUID, User | None] = {}
+    missing = set()
+    for r in live:
+        uid = uuid.UUID(r["claims"]["sub"])
+        cached = user_cache.get(uid, min_version=r["claims"].get("ver", 0))
+        if cached is not None:
+            users[uid] = cached
+        elif uid not in users:
+            missing.add(uid)
+    if missing:
+        for user in db.query(User).filter(User.id.in_(missing)):
+            users[user.id] = user
+            user_cache.put(user)
+    for r in live:
+        user = users.get(uuid.UUID(r["claims"]["sub"]))
+        if r["claims"]["jti"] in revoked or (user and tokens_revoked(r["claims"], user)):
+            r.update(active=False, claims=None, reason="token_revoked")
+        elif not user or not user.is_active:
+            r.update(active=False, claims=None, reason="inactive_user")
+    return results
+
+def introspect_tokens(db: Session, tokens: list[str]) -> list[dict]:
+    return _resolve_batch(db, _decode_batch(tokens))
+
+async def introspect_tokens_async(db: Session | AsyncSession, tokens: list[str]) -> list[dict]:
+    # signature checks are CPU work: keep them off the event loop, then resolve in one DB visit
+    decoded = await run_in_threadpool(_decode_batch, tokens)
+    return await run_db(db, _resolve_batch, decoded)
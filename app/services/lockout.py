@@ -0,0 +1,179 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.lazy import Lazy
+
+
+class MemoryFailureStore:
+    """Per-process LRU of (failures, locked_until, last_failure) by key."""
+
+    blocking = False
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._entries: OrderedDict[str, tuple[int, float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> tuple[int, float, float] | None:
+        with self._lock:
+            return self._entries.get(key)
+
+    def update(self, key: str, fn) -> tuple[int, float, float]:
+        with self._lock:
+            value = fn(self._entries.get(key))
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+            return value
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteFailureStore:
+    """Same interface backed by a SQLite file, so all workers on a host share lockouts."""
+
+    # writes wait (up to the busy timeout) for other workers' write locks
+    blocking = True
+    _PURGE_EVERY = 1000
+
+    def __init__(self, path: str, window: float):
+        self.window = window
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path or ":memory:", timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS login_failures "
+            "(key TEXT PRIMARY KEY, failures INTEGER NOT NULL, locked_until REAL NOT NULL, last_failure REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> tuple[int, float, float] | None:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT failures, locked_until, last_failure FROM login_failures WHERE key = ?", (key,)
+            ).fetchone()
+
+    def update(self, key: str, fn) -> tuple[int, float, float]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                current = self._conn.execute(
+                    "SELECT failures, locked_until, last_failure FROM login_failures WHERE key = ?", (key,)
+                ).fetchone()
+                value = fn(current)
+                self._conn.execute(
+                    "INSERT INTO login_failures (key, failures, locked_until, last_failure) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET failures = excluded.failures, "
+                    "locked_until = excluded.locked_until, last_failure = excluded.last_failure",
+                    (key, *value),
+                )
+                self._writes += 1
+                if self._writes % self._PURGE_EVERY == 0:
+                    self._conn.execute("DELETE FROM login_failures WHERE last_failure < ? AND locked_until < ?", (value[2] - self.window, value[2]))
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return value
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM login_failures WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM login_failures")
+
+
+class LoginFailureTracker:
+    """Exponential-backoff lockouts per email and per client IP.
+
+    `check` runs before the user lookup and before bcrypt, so once a key is locked
+    further guesses cost a dict (or primary-key) lookup instead of a KDF run.
+    """
+
+    def __init__(self, store, enabled: bool, email_threshold: int, ip_threshold: int, base: float, max_lock: float, window: float):
+        self.store = store
+        self.enabled = enabled
+        self.email_threshold = email_threshold
+        self.ip_threshold = ip_threshold
+        self.base = base
+        self.max_lock = max_lock
+        self.window = window
+
+    def _keys(self, email: str, ip: str | None) -> list[tuple[str, int]]:
+        keys = [(f"email:{email.strip().lower()}", self.email_threshold)]
+        if ip:
+            keys.append((f"ip:{ip}", self.ip_threshold))
+        return keys
+
+    def check(self, email: str, ip: str | None = None):
+        if not self.enabled:
+            return
+        now = time.time()
+        for key, _ in self._keys(email, ip):
+            entry = self.store.get(key)
+            if entry and entry[1] > now:
+                raise HTTPException(
+                    status_code=429,
+                    detail={"code": "login_locked", "message": "Too many failed attempts, try again later."},
+                    headers={"Retry-After": str(int(entry[1] - now) + 1)},
+                )
+
+    def record_failure(self, email: str, ip: str | None = None):
+        if not self.enabled:
+            return
+        now = time.time()
+        for key, threshold in self._keys(email, ip):
+            def bump(entry, threshold=threshold):
+                failures = 1
+                # failures are forgotten `window` seconds after the last failure or lock
+                if entry and now - max(entry[1], entry[2]) < self.window:
+                    failures = entry[0] + 1
+                locked_until = entry[1] if entry else 0.0
+                if failures >= threshold:
+                    locked_until = now + min(self.base * 2 ** (failures - threshold), self.max_lock)
+                return failures, locked_until, now
+            self.store.update(key, bump)
+
+    def record_success(self, email: str):
+        # IP counters are left to decay: one valid account must not unlock a spraying IP
+        if self.enabled:
+            self.store.delete(f"email:{email.strip().lower()}")
+
+    async def run_async(self, fn, *args):
+        """Run `fn` (a check or record against this tracker), on the threadpool when the store can block."""
+        if self.enabled and self.store.blocking:
+            return await run_in_threadpool(fn, *args)
+        return fn(*args)
+
+
+def _make_store():
+    uri = settings.LOGIN_LOCKOUT_STORAGE_URI
+    if uri.startswith("sqlite://"):
+        return SQLiteFailureStore(uri.split("://", 1)[1][1:], settings.LOGIN_LOCKOUT_WINDOW_SECONDS)
+    return MemoryFailureStore(settings.LOGIN_LOCKOUT_MAX_TRACKED)
+
+
+login_tracker = Lazy(lambda: LoginFailureTracker(
+    _make_store(),
+    enabled=settings.LOGIN_LOCKOUT_ENABLED,
+    email_threshold=settings.LOGIN_LOCKOUT_THRESHOLD,
+    ip_threshold=settings.LOGIN_LOCKOUT_IP_THRESHOLD,
+    base=settings.LOGIN_LOCKOUT_BASE_SECONDS,
+    max_lock=settings.LOGIN_LOCKOUT_MAX_SECONDS,
+    window=settings.LOGIN_LOCKOUT_WINDOW_SECONDS,
+))
@@ -0,0 +1,253 @@
+import asyncio
+import logging
+import smtplib
+import threading
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from typing import Callable
+
+from sqlalchemy import inspect, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.security import create_jwt_token
+from app.models.email_outbox import EmailOutbox
+from app.models.email_token import EmailToken, EmailTokenPurpose
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES = {
+    EmailTokenPurpose.verify_email: ("Verify your email", "Use this token to verify your email address:\n\n{token}\n"),
+    EmailTokenPurpose.reset_password: (
+        "Reset your password",
+        "Use this token to reset your password:\n\n{token}\n\nIf you did not request a reset, ignore this email.\n",
+    ),
+}
+
+def ensure_outbox_schema(engine: Engine) -> bool:
+    """Create email_outbox and its indexes in an existing database; True if the table was created."""
+    created = not inspect(engine).has_table(EmailOutbox.__tablename__)
+    with engine.begin() as conn:
+        EmailOutbox.__table__.create(conn, checkfirst=True)
+        for index in EmailOutbox.__table__.indexes:
+            index.create(conn, checkfirst=True)
+    return created
+
+
+# claimed rows are skipped by other workers until every send in the batch could have
+# timed out (twice, with the reconnect) plus this margin; covers a crash mid-batch
+CLAIM_MARGIN_SECONDS = 60
+MAX_BACKOFF_SECONDS = 3600
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue_email(db: Session, to_address: str, purpose: EmailTokenPurpose, email_token_jti: str, expires_at: datetime):
+    """Stage an outbox row in the caller's transaction; nothing is sent until it commits."""
+    db.add(EmailOutbox(
+        to_address=to_address,
+        subject=f"{settings.APP_NAME}: {TEMPLATES[purpose][0]}",
+        email_token_jti=email_token_jti,
+        attempts=0,
+        next_attempt_at=_now(),
+        expires_at=expires_at,
+    ))
+
+
+def render_body(et: EmailToken | None) -> str:
+    # same jti, subject, purpose and expiry as the token create_email_token returned
+    if et is None or et.used:
+        raise LookupError("email token no longer valid")
+    expires_at = et.expires_at if et.expires_at.tzinfo else et.expires_at.replace(tzinfo=timezone.utc)
+    tok = create_jwt_token(str(et.user_id), "email", extra_claims={"purpose": et.purpose.value}, jti=et.jti, expires_at=expires_at)
+    return TEMPLATES[et.purpose][1].format(token=tok["token"])
+
+
+# the only environments where mail may be logged instead of sent: bodies carry live
+# verify/reset tokens, which must never reach production log storage
+LOG_SENDER_ENVS = ("dev", "development", "test")
+
+
+class LogSender:
+    """Development fallback when SMTP_HOST is unset: the message goes to the log."""
+
+    def send(self, to_address: str, subject: str, body: str):
+        logger.info("email to %s: %s\n%s", to_address, subject, body)
+
+    def close(self):
+        pass
+
+
+class SMTPSender:
+    """Keeps one authenticated SMTP connection open across batches, reconnecting when dropped."""
+
+    def __init__(self, host: str, port: int, username: str | None, password: str | None, starttls: bool, from_address: str, timeout: float):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.from_address = from_address
+        self.timeout = timeout
+        self._smtp: smtplib.SMTP | None = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> smtplib.SMTP:
+        if self._smtp is None:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password or "")
+            self._smtp = smtp
+        return self._smtp
+
+    def send(self, to_address: str, subject: str, body: str):
+        msg = EmailMessage()
+        msg["From"] = self.from_address
+        msg["To"] = to_address
+        msg["Subject"] = subject
+        msg.set_content(body)
+        with self._lock:
+            try:
+                self._connection().send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                # idle connections get closed server-side; retry once on a fresh one
+                self._smtp = None
+                self._connection().send_message(msg)
+            except (smtplib.SMTPException, OSError):
+                self._close()
+                raise
+
+    def _close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+def make_sender():
+    if not settings.SMTP_HOST:
+        if settings.ENV not in LOG_SENDER_ENVS:
+            raise RuntimeError(f"SMTP_HOST is required with ENV={settings.ENV}: without it, emails and their tokens would only be logged")
+        return LogSender()
+    return SMTPSender(
+        settings.SMTP_HOST,
+        settings.SMTP_PORT,
+        settings.SMTP_USERNAME,
+        settings.SMTP_PASSWORD,
+        settings.SMTP_STARTTLS,
+        settings.EMAIL_FROM,
+        settings.SMTP_TIMEOUT,
+    )
+
+
+def _due(db: Session, now: datetime, batch_size: int) -> list[EmailOutbox]:
+    return db.execute(
+        select(EmailOutbox)
+        .where(
+            EmailOutbox.sent_at.is_(None),
+            EmailOutbox.next_attempt_at <= now,
+            EmailOutbox.expires_at > now,
+            EmailOutbox.attempts < settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+        )
+        .order_by(EmailOutbox.next_attempt_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+
+
+def _claim(db: Session, rows: list[EmailOutbox], now: datetime) -> list[EmailOutbox]:
+    # SKIP LOCKED does nothing on SQLite, so the claim is a conditional UPDATE per row:
+    # of two workers that read the same due row, only the first UPDATE still matches.
+    # Committed at once, so SMTP round trips never hold row locks
+    claimed_until = now + timedelta(seconds=len(rows) * 2 * settings.SMTP_TIMEOUT + CLAIM_MARGIN_SECONDS)
+    claimed = [
+        row for row in rows
+        if db.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id == row.id, EmailOutbox.sent_at.is_(None), EmailOutbox.next_attempt_at <= now)
+            .values(next_attempt_at=claimed_until)
+            .execution_options(synchronize_session=False)
+        ).rowcount == 1
+    ]
+    db.commit()
+    return claimed
+
+
+def deliver_batch(db: Session, sender, batch_size: int | None = None, now: datetime | None = None) -> dict:
+    """Send up to `batch_size` due outbox rows; failures are rescheduled with exponential backoff."""
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    now = now or _now()
+    rows = _due(db, now, batch_size)
+    if not rows:
+        db.rollback()
+        return {"sent": 0, "failed": 0}
+    rows = _claim(db, rows, now)
+    if not rows:
+        return {"sent": 0, "failed": 0}
+    email_tokens = {et.jti: et for et in db.scalars(select(EmailToken).where(EmailToken.jti.in_([row.email_token_jti for row in rows])))}
+
+    sent = failed = 0
+    for row in rows:
+        try:
+            sender.send(row.to_address, row.subject, render_body(email_tokens.get(row.email_token_jti)))
+        except Exception as exc:
+            failed += 1
+            row.attempts += 1
+            row.last_error = str(exc)[:500]
+            delay = min(settings.EMAIL_OUTBOX_BACKOFF_SECONDS * 2 ** (row.attempts - 1), MAX_BACKOFF_SECONDS)
+            row.next_attempt_at = _now() + timedelta(seconds=delay)
+            logger.warning("email to %s failed (attempt %d): %s", row.to_address, row.attempts, exc)
+        else:
+            sent += 1
+            row.sent_at = _now()
+        # one commit per message: a crash mid-batch re-sends nothing already delivered
+        db.commit()
+    return {"sent": sent, "failed": failed}
+
+
+def run_outbox(session_factory: Callable[[], Session], sender, batch_size: int | None = None) -> dict:
+    db = session_factory()
+    try:
+        return deliver_batch(db, sender, batch_size)
+    finally:
+        db.close()
+
+
+def drain_outbox(session_factory: Callable[[], Session], sender, batch_size: int | None = None) -> dict:
+    """Deliver batches until no due mail is left (scripts/send_outbox.py)."""
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    total = {"sent": 0, "failed": 0}
+    while True:
+        report = run_outbox(session_factory, sender, batch_size)
+        total = {k: total[k] + report[k] for k in total}
+        # failures are rescheduled past now, so a short batch means nothing is due
+        if report["sent"] + report["failed"] < batch_size:
+            return total
+
+
+async def outbox_loop(session_factory: Callable[[], Session], sender, interval: float):
+    batch_size = settings.EMAIL_OUTBOX_BATCH_SIZE
+    try:
+        while True:
+            report = {"sent": 0, "failed": 0}
+            try:
+                report = await run_in_threadpool(run_outbox, session_factory, sender, batch_size)
+            except Exception:
+                logger.exception("email outbox delivery failed")
+            # a full batch means more is waiting: drain without sleeping
+            if report["sent"] + report["failed"] < batch_size:
+                await asyncio.sleep(interval)
+    finally:
+        sender.close()
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import uuid
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.hashing import hashing_pool
+from app.core.metrics import registry
+from app.core.security import hash_password_async, password_needs_rehash, target_bcrypt_rounds
+from app.db.session import detached_session, run_db
+from app.models.user import User
+from app.services.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+rehashes = registry.counter("password_rehash_total", "Outdated password hashes handled after login, by outcome.", ("outcome",))
+
+# strong references so scheduled rehashes are not garbage collected mid-flight
+_tasks: set[asyncio.Task] = set()
+
+
+def _store_rehash(db: Session, user_id: uuid.UUID, old_hash: str, new_hash: str) -> bool:
+    # conditional on the old hash: a password change made meanwhile must win
+    updated = db.execute(
+        update(User)
+        .where(User.id == user_id, User.hashed_password == old_hash)
+        .values(hashed_password=new_hash)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+    db.commit()
+    if updated:
+        user_cache.invalidate(user_id)
+    return updated
+
+
+async def _rehash(db: Session | AsyncSession, user_id: uuid.UUID, old_hash: str, password: str):
+    try:
+        new_hash = await hash_password_async(password)
+        updated = await run_db(db, _store_rehash, user_id, old_hash, new_hash)
+        rehashes.inc("upgraded" if updated else "superseded")
+    except Exception:
+        rehashes.inc("failed")
+        logger.exception("password rehash failed for user %s", user_id)
+    finally:
+        if isinstance(db, AsyncSession):
+            await db.close()
+        else:
+            db.close()
+
+
+def schedule_rehash(db: Session | AsyncSession, user: User, password: str) -> asyncio.Task | None:
+    """After a successful login, move `user` to the configured bcrypt cost off the request path."""
+    if not settings.PASSWORD_REHASH_ON_LOGIN or not password_needs_rehash(user.hashed_password):
+        return None
+    if not hashing_pool.has_capacity():
+        # never queue ahead of logins for a KDF worker; the next login tries again
+        rehashes.inc("deferred")
+        return None
+    task = asyncio.create_task(_rehash(detached_session(db), user.id, user.hashed_password, password))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return task
+
+
+def hash_cost_report(db: Session) -> dict:
+    """How many users already have a hash at the configured cost."""
+    cost = func.substr(User.hashed_password, 5, 2).label("cost")
+    by_cost = {}
+    for value, count in db.execute(select(cost, func.count()).group_by(cost)).all():
+        key = int(value) if value and value.isdigit() else "other"
+        by_cost[key] = by_cost.get(key, 0) + count
+    target = target_bcrypt_rounds()
+    total = sum(by_cost.values())
+    current = by_cost.get(target, 0)
+    return {
+        "target_rounds": target,
+        "users": total,
+        "current": current,
+        "outdated": total - current,
+        "progress": current / total if total else 1.0,
+        "by_rounds": {str(k): v for k, v in sorted(by_cost.items(), key=lambda kv: str(kv[0]))},
+    }
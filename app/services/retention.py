@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.models.email_outbox import EmailOutbox
+from app.models.email_token import EmailToken
+from app.models.token import RefreshToken, TokenBlacklist
+
+logger = logging.getLogger(__name__)
+
+# every table here has an indexed expires_at; on Postgres a table could instead be
+# range-partitioned on expires_at and purged by dropping whole partitions
+PURGEABLE = (RefreshToken, TokenBlacklist, EmailToken, EmailOutbox)
+
+
+def purge_expired(db: Session, model, batch_size: int, pause: float = 0.0, now: datetime | None = None) -> int:
+    """Delete rows of `model` whose expires_at has passed, `batch_size` rows per transaction."""
+    cutoff = now or datetime.now(timezone.utc)
+    total = 0
+    while True:
+        ids = select(model.id).where(model.expires_at < cutoff).limit(batch_size)
+        deleted = db.execute(
+            delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        total += deleted
+        if deleted < batch_size:
+            return total
+        if pause:
+            time.sleep(pause)
+
+
+def run_purge(session_factory: Callable[[], Session], batch_size: int | None = None, pause: float | None = None) -> dict:
+    batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+    pause = settings.RETENTION_BATCH_PAUSE_SECONDS if pause is None else pause
+    now = datetime.now(timezone.utc)
+    report = {}
+    db = session_factory()
+    try:
+        for model in PURGEABLE:
+            report[model.__tablename__] = purge_expired(db, model, batch_size, pause, now)
+    finally:
+        db.close()
+    logger.info("retention purge: %s", report)
+    return report
+
+
+async def retention_loop(session_factory: Callable[[], Session], interval: float):
+    while True:
+        try:
+            await run_in_threadpool(run_purge, session_factory)
+        except Exception:
+            logger.exception("retention purge failed")
+        await asyncio.sleep(interval)
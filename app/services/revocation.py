@@ -0,0 +1,158 @@
+import heapq
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.lazy import Lazy
+from app.db.session import run_db
+from app.models.token import TokenBlacklist
+from app.services.user_cache import user_cache
+
+# user-state changes (logout-all, password change, deactivation) are published as
+# blacklist rows too, so every worker drops its cached copy of the user on its next refresh
+USER_SIGNAL_PREFIX = "user:"
+
+
+def user_signal(user_id: uuid.UUID) -> TokenBlacklist:
+    # one row per change; it only has to outlive the user_cache entries it invalidates
+    return TokenBlacklist(
+        jti=f"{USER_SIGNAL_PREFIX}{user_id.hex}:{uuid.uuid4().hex[:16]}",
+        reason="user_changed",
+        expires_at=datetime.now(timezone.utc) + timedelta(seconds=settings.USER_CACHE_TTL_SECONDS),
+    )
+
+
+def _ts(dt: datetime | None) -> float | None:
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class RevocationCache:
+    """Per-process mirror of token_blacklist so the not-revoked case needs no query.
+
+    The set is refreshed incrementally (rows with created_at past the last one seen)
+    at most once per `max_staleness` seconds, and entries drop out at their expires_at.
+    created_at is stamped by the writing host, so a row that commits late or comes
+    from a lagging clock can fall behind the window; a full reload every
+    `full_refresh` seconds picks those up.
+    A refresh also applies `user_signal` rows to user_cache, which bounds how long
+    another worker's logout-all or deactivation can go unseen here.
+    """
+
+    def __init__(self, enabled: bool, max_staleness: float, full_refresh: float = 60.0):
+        self.enabled = enabled
+        self.max_staleness = max_staleness
+        self.full_refresh = full_refresh
+        self._jtis: set[str] = set()
+        self._expiry: list[tuple[float, str]] = []
+        self._last_seen: datetime | None = None
+        self._refreshed_at = 0.0
+        self._full_refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, jti: str, expires_at: datetime | None):
+        with self._lock:
+            self._add(jti, _ts(expires_at))
+
+    def _add(self, jti: str, exp: float | None) -> bool:
+        if exp is not None and exp <= time.time():
+            return False
+        if jti in self._jtis:
+            return False
+        self._jtis.add(jti)
+        if exp is not None:
+            heapq.heappush(self._expiry, (exp, jti))
+        return True
+
+    def _evict_expired(self):
+        now = time.time()
+        while self._expiry and self._expiry[0][0] <= now:
+            _, jti = heapq.heappop(self._expiry)
+            self._jtis.discard(jti)
+
+    def refresh(self, db: Session, full: bool = False):
+        started = time.monotonic()
+        full = full or self._last_seen is None or started - self._full_refreshed_at > self.full_refresh
+        q = db.query(TokenBlacklist.jti, TokenBlacklist.expires_at, TokenBlacklist.created_at).filter(
+            or_(TokenBlacklist.expires_at.is_(None), TokenBlacklist.expires_at > datetime.now(timezone.utc))
+        )
+        if not full:
+            # overlap the window so rows committed late by other workers are not missed
+            q = q.filter(TokenBlacklist.created_at >= self._last_seen - timedelta(seconds=self.max_staleness))
+        rows = q.all()
+        with self._lock:
+            for jti, expires_at, created_at in rows:
+                if self._add(jti, _ts(expires_at)) and jti.startswith(USER_SIGNAL_PREFIX):
+                    user_cache.invalidate(uuid.UUID(jti[len(USER_SIGNAL_PREFIX):][:32]))
+                if created_at is not None and (self._last_seen is None or created_at > self._last_seen):
+                    self._last_seen = created_at
+            self._refreshed_at = time.monotonic()
+            if full:
+                # merged rather than swapped in: add() calls made meanwhile are kept
+                self._full_refreshed_at = started
+
+    @staticmethod
+    def _query(db: Session, jti: str) -> bool:
+        return db.query(TokenBlacklist.id).filter(TokenBlacklist.jti == jti).first() is not None
+
+    def _is_stale(self) -> bool:
+        return time.monotonic() - self._refreshed_at > self.max_staleness
+
+    def _contains(self, jti: str) -> bool:
+        with self._lock:
+            self._evict_expired()
+            return jti in self._jtis
+
+    def is_revoked(self, db: Session, jti: str) -> bool:
+        if not self.enabled:
+            return self._query(db, jti)
+        if self._is_stale():
+            self.refresh(db)
+        return self._contains(jti)
+
+    def revoked_among(self, db: Session, jtis: list[str]) -> set[str]:
+        # batch form of is_revoked: at most one query for any number of jtis
+        if not jtis:
+            return set()
+        if not self.enabled:
+            return {jti for (jti,) in db.query(TokenBlacklist.jti).filter(TokenBlacklist.jti.in_(jtis))}
+        if self._is_stale():
+            self.refresh(db)
+        with self._lock:
+            self._evict_expired()
+            return {jti for jti in jtis if jti in self._jtis}
+
+    async def is_revoked_async(self, db: Session | AsyncSession, jti: str) -> bool:
+        # only touches the DB when disabled or due for a refresh
+        if not self.enabled:
+            return await run_db(db, self._query, jti, read_only=True)
+        if self._is_stale():
+            # not read_only: a lagging replica could skip rows until the next full reload
+            await run_db(db, self.refresh)
+        return self._contains(jti)
+
+    def clear(self):
+        with self._lock:
+            self._jtis.clear()
+            self._expiry.clear()
+            self._last_seen = None
+            self._refreshed_at = 0.0
+            self._full_refreshed_at = 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"enabled": self.enabled, "size": len(self._jtis), "max_staleness": self.max_staleness, "full_refresh": self.full_refresh}
+
+
+revocation_cache = Lazy(lambda: RevocationCache(
+    settings.REVOCATION_CACHE_ENABLED, settings.REVOCATION_CACHE_MAX_STALENESS_SECONDS, settings.REVOCATION_CACHE_FULL_REFRESH_SECONDS,
+))
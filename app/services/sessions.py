@@ -0,0 +1,106 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, inspect, or_, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.security import _now
+from app.db.session import run_db
+from app.models.token import RefreshToken
+
+# columns added for session listing, with their DDL types for existing tables
+SESSION_COLUMNS = {"user_agent": "VARCHAR(255)", "ip_address": "VARCHAR(45)", "last_used_at": "TIMESTAMP WITH TIME ZONE"}
+# replaced by ix_refresh_tokens_user_active, whose leading column is user_id
+SUPERSEDED_INDEXES = ("ix_refresh_tokens_user_id",)
+
+
+def ensure_session_schema(engine: Engine) -> list[str]:
+    """Add the session metadata columns and the (user_id, revoked, expires_at) index; returns added columns."""
+    table = RefreshToken.__tablename__
+    inspector = inspect(engine)
+    columns = {c["name"] for c in inspector.get_columns(table)}
+    indexes = {i["name"] for i in inspector.get_indexes(table)}
+    added = [name for name in SESSION_COLUMNS if name not in columns]
+    with engine.begin() as conn:
+        for name in added:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {SESSION_COLUMNS[name]}"))
+        for index in RefreshToken.__table__.indexes:
+            index.create(conn, checkfirst=True)
+        for name in SUPERSEDED_INDEXES:
+            if name in indexes:
+                conn.execute(text(f"DROP INDEX {name}"))
+    return added
+
+
+def session_id(rt: RefreshToken) -> str:
+    # a session is a refresh-token family; rows from before families existed stand alone
+    return rt.family_id or rt.jti
+
+
+def encode_cursor(rt: RefreshToken) -> str:
+    raw = json.dumps([rt.expires_at.isoformat(), rt.jti]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        expires_at, jti = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(expires_at), str(jti)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"code": "invalid_cursor", "message": "Invalid pagination cursor."})
+
+
+def list_sessions(db: Session, user_id: uuid.UUID, limit: int, cursor: str | None = None) -> tuple[list[RefreshToken], str | None]:
+    """One page of live sessions, newest expiry first, and the cursor for the next page.
+
+    Every rotation revokes the previous row, so a live row is exactly one session.
+    Each row expires REFRESH_TOKEN_EXPIRE_DAYS after its login or refresh, so this is
+    also most recently refreshed first (last_used_at is that issue time; access-token
+    use is not tracked) unless the setting changed since. Keyset pagination on
+    (expires_at, jti) walks ix_refresh_tokens_user_active instead of counting past
+    revoked history with OFFSET.
+    """
+    q = select(RefreshToken).where(
+        RefreshToken.user_id == user_id,
+        RefreshToken.revoked.is_(False),
+        RefreshToken.expires_at > _now(),
+    )
+    if cursor:
+        expires_at, jti = decode_cursor(cursor)
+        q = q.where(or_(
+            RefreshToken.expires_at < expires_at,
+            and_(RefreshToken.expires_at == expires_at, RefreshToken.jti < jti),
+        ))
+    rows = db.scalars(q.order_by(RefreshToken.expires_at.desc(), RefreshToken.jti.desc()).limit(limit + 1)).all()
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
+
+
+def revoke_session(db: Session, user_id: uuid.UUID, sid: str) -> bool:
+    revoked = db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.user_id == user_id,
+            RefreshToken.revoked.is_(False),
+            or_(RefreshToken.family_id == sid, and_(RefreshToken.family_id.is_(None), RefreshToken.jti == sid)),
+        )
+        .values(revoked=True)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return revoked > 0
+
+
+async def list_sessions_async(db: Session | AsyncSession, user_id: uuid.UUID, limit: int, cursor: str | None = None) -> tuple[list[RefreshToken], str | None]:
+    return await run_db(db, list_sessions, user_id, limit, cursor)
+
+
+async def revoke_session_async(db: Session | AsyncSession, user_id: uuid.UUID, sid: str):
+    if not await run_db(db, revoke_session, user_id, sid):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail={"code": "session_not_found", "message": "No such active session."})
@@ -0,0 +1,65 @@
+import logging
+
+from sqlalchemy import bindparam, func, inspect, or_, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, aliased
+
+from app.models.token import RefreshToken
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_family_schema(engine: Engine) -> bool:
+    """Add refresh_tokens.family_id and the lineage indexes to an existing table; True if altered."""
+    columns = {c["name"] for c in inspect(engine).get_columns(RefreshToken.__tablename__)}
+    altered = "family_id" not in columns
+    with engine.begin() as conn:
+        if altered:
+            conn.execute(text(f"ALTER TABLE {RefreshToken.__tablename__} ADD COLUMN family_id VARCHAR(64)"))
+        for index in RefreshToken.__table__.indexes:
+            index.create(conn, checkfirst=True)
+    return altered
+
+
+def backfill_families(db: Session, batch_size: int = 1000) -> int:
+    """Give every existing refresh token the family of its oldest surviving ancestor.
+
+    Works a page of chain roots at a time: the roots are rows without a family
+    whose parent is absent, purged or already in a family. A recursive CTE walks
+    each page's descendants and the UPDATE runs in the database, so memory stays
+    flat however large the token history is.
+    """
+    table = RefreshToken.__tablename__
+    parent = aliased(RefreshToken)
+    roots_q = (
+        select(RefreshToken.jti)
+        .outerjoin(parent, parent.jti == RefreshToken.parent_jti)
+        .where(RefreshToken.family_id.is_(None), or_(parent.jti.is_(None), parent.family_id.is_not(None)))
+        .order_by(RefreshToken.jti)
+        .limit(batch_size)
+    )
+    # a root joins its parent's family, or is named after a purged parent so the surviving
+    # siblings stay one family, or starts its own (a login)
+    lineage = text(f"""
+        WITH RECURSIVE lineage(jti, family) AS (
+            SELECT c.jti, COALESCE(p.family_id, c.parent_jti, c.jti)
+            FROM {table} c LEFT JOIN {table} p ON p.jti = c.parent_jti
+            WHERE c.jti IN :roots
+            UNION ALL
+            SELECT c.jti, lineage.family
+            FROM {table} c JOIN lineage ON c.parent_jti = lineage.jti
+            WHERE c.family_id IS NULL
+        )
+        UPDATE {table} SET family_id = (SELECT family FROM lineage WHERE lineage.jti = {table}.jti)
+        WHERE jti IN (SELECT jti FROM lineage)
+    """).bindparams(bindparam("roots", expanding=True))
+    # rowcount is not reported for WITH ... UPDATE by every driver
+    unassigned = select(func.count()).select_from(RefreshToken).where(RefreshToken.family_id.is_(None))
+    before = db.scalar(unassigned)
+    # updated rows leave the roots query, so each pass takes the next page
+    while roots := db.scalars(roots_q).all():
+        db.execute(lineage, {"roots": roots})
+        db.commit()
+    backfilled = before - db.scalar(unassigned)
+    logger.info("backfilled family_id on %d refresh tokens", backfilled)
+    return backfilled
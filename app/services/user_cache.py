@@ -0,0 +1,89 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.config import settings
+from app.core.lazy import Lazy
+from app.models.user import User
+
+_COLUMNS = [c.key for c in inspect(User).column_attrs]
+# columns the cache and token checks rely on, with their DDL for existing users tables
+USER_TOKEN_COLUMNS = {"token_version": "INTEGER DEFAULT 0 NOT NULL", "tokens_valid_after": "TIMESTAMP WITH TIME ZONE"}
+
+
+def ensure_user_token_schema(engine: Engine) -> list[str]:
+    """Add the token-state columns to an existing users table; returns the columns added."""
+    table = User.__tablename__
+    columns = {c["name"] for c in inspect(engine).get_columns(table)}
+    added = [name for name in USER_TOKEN_COLUMNS if name not in columns]
+    with engine.begin() as conn:
+        for name in added:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {USER_TOKEN_COLUMNS[name]}"))
+    return added
+
+
+class UserStateCache:
+    """LRU + TTL cache of user rows for authenticated requests.
+
+    Entries are snapshots of column values; every hit returns a fresh detached
+    User so callers never share an instance across requests. Writers call
+    `invalidate`, and a token minted for a newer token_version than the cached
+    one forces a reload. Changes made by other workers arrive as signal rows
+    through the revocation cache (see app.services.revocation.user_signal).
+    """
+
+    def __init__(self, enabled: bool, max_size: int, ttl: float):
+        self.enabled = enabled
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[uuid.UUID, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: uuid.UUID, min_version: int = 0) -> User | None:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= time.monotonic() or entry[1]["token_version"] < min_version:
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            values = entry[1]
+        user = User(**values)
+        make_transient_to_detached(user)
+        return user
+
+    def put(self, user: User):
+        if not self.enabled:
+            return
+        values = {k: getattr(user, k) for k in _COLUMNS}
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: uuid.UUID):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"enabled": self.enabled, "size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+user_cache = Lazy(lambda: UserStateCache(settings.USER_CACHE_ENABLED, settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL_SECONDS))
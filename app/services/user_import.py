@@ -0,0 +1,206 @@
+import csv
+import json
+import re
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import islice, repeat
+from typing import AsyncIterator, Iterable, Iterator
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.lazy import Lazy
+from app.core.security import PASSWORD_RE, _bcrypt_context
+from app.db.session import run_db
+from app.models.user import Role, User
+from app.schemas.user import UserImportRow
+
+FORMATS = ("csv", "jsonl")
+BCRYPT_HASH_RE = re.compile(r"^\$2[aby]\$\d\d\$[./A-Za-z0-9]{53}$")
+
+# separate from hashing_pool: a large import must not queue ahead of logins. Sized by
+# USER_IMPORT_HASH_WORKERS per app worker, not the CPU count: every worker gets its own
+import_pool = Lazy(
+    lambda: ProcessPoolExecutor(max_workers=settings.USER_IMPORT_HASH_WORKERS),
+    close=lambda pool: pool.shutdown(wait=False, cancel_futures=True),
+)
+
+
+@lru_cache(maxsize=None)
+def _context(rounds: int):
+    return _bcrypt_context(rounds)
+
+
+def _hash(password: str, rounds: int) -> str:
+    # runs in the pool's worker processes: the cost is passed in, not read from settings
+    return _context(rounds).hash(password)
+
+
+def read_rows(lines: Iterable[str], fmt: str) -> Iterator[tuple[int, dict | None]]:
+    """Yield (line number, row) from CSV (with a header) or JSON Lines; None marks an unparsable line."""
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            # empty CSV cells mean "not given", not ""
+            yield reader.line_num, {k.strip(): v for k, v in row.items() if k and v not in (None, "")}
+        return
+    for line_no, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_no, row if isinstance(row, dict) else None
+
+
+def new_report() -> dict:
+    return {"rows": 0, "created": 0, "conflicts": 0, "invalid": 0, "errors": [], "errors_truncated": False}
+
+
+class UserImporter:
+    """Validate, hash and insert imported users in batches.
+
+    Per batch: one SELECT for emails already taken, the remaining passwords hashed
+    in `executor`, then a single multi-row INSERT and commit. Rows that fail are
+    counted and listed (up to `max_errors`) in the report instead of aborting.
+    """
+
+    def __init__(
+        self,
+        executor: Executor | None = None,
+        batch_size: int | None = None,
+        rounds: int | None = None,
+        max_errors: int | None = None,
+    ):
+        self.executor = executor
+        self.batch_size = batch_size or settings.USER_IMPORT_BATCH_SIZE
+        self.rounds = rounds or settings.BCRYPT_ROUNDS
+        self.max_errors = settings.USER_IMPORT_MAX_ERRORS if max_errors is None else max_errors
+        self.report = new_report()
+        self._seen: set[str] = set()
+
+    def _error(self, line: int, email: str | None, code: str, message: str, counter: str = "invalid"):
+        self.report[counter] += 1
+        if len(self.report["errors"]) >= self.max_errors:
+            self.report["errors_truncated"] = True
+            return
+        self.report["errors"].append({"line": line, "email": email, "code": code, "message": message})
+
+    def _validate(self, batch: list[tuple[int, dict | None]]) -> list[tuple[int, dict, str | None]]:
+        """(line, insert values, plaintext password to hash or None) for every acceptable row."""
+        records = []
+        now = datetime.now(timezone.utc)
+        for line, raw in batch:
+            self.report["rows"] += 1
+            if raw is None:
+                self._error(line, None, "invalid_row", "Line is not a JSON object.")
+                continue
+            try:
+                row = UserImportRow.model_validate(raw)
+            except ValidationError as e:
+                err = e.errors()[0]
+                field = ".".join(str(p) for p in err["loc"]) or "row"
+                self._error(line, raw.get("email"), "invalid_row", f"{field}: {err['msg']}")
+                continue
+            if row.password_hash:
+                if not BCRYPT_HASH_RE.match(row.password_hash):
+                    self._error(line, row.email, "invalid_hash", "password_hash must be a bcrypt hash.")
+                    continue
+            elif not row.password:
+                self._error(line, row.email, "missing_password", "Either password or password_hash is required.")
+                continue
+            elif not PASSWORD_RE.match(row.password):
+                self._error(line, row.email, "weak_password", "Password must be at least 8 chars, include upper, lower, and digit.")
+                continue
+            if row.email in self._seen:
+                self._error(line, row.email, "duplicate_in_file", "Email appears earlier in the file.", counter="conflicts")
+                continue
+            self._seen.add(row.email)
+            values = {
+                "email": row.email,
+                "hashed_password": row.password_hash,
+                "full_name": row.full_name,
+                "role": Role(row.role.value),
+                "is_active": row.is_active,
+                "email_verified_at": now if row.email_verified else None,
+                "token_version": 0,
+            }
+            records.append((line, values, None if row.password_hash else row.password))
+        return records
+
+    def _drop_taken(self, records: list[tuple[int, dict, str | None]], taken: set[str]) -> list[tuple[int, dict, str | None]]:
+        kept = []
+        for line, values, password in records:
+            if values["email"] in taken:
+                self._error(line, values["email"], "email_taken", "Email already registered.", counter="conflicts")
+            else:
+                kept.append((line, values, password))
+        return kept
+
+    @staticmethod
+    def _taken(db: Session, emails: list[str]) -> set[str]:
+        return set(db.scalars(select(User.email).where(User.email.in_(emails)))) if emails else set()
+
+    def _hash_all(self, records: list[tuple[int, dict, str | None]]):
+        pending = [values for _, values, password in records if password is not None]
+        passwords = [password for _, _, password in records if password is not None]
+        if not passwords:
+            return
+        executor = self.executor or import_pool.resolve()
+        # chunks amortise the pickling round trip to the worker processes
+        hashes = executor.map(_hash, passwords, repeat(self.rounds), chunksize=16)
+        for values, hashed in zip(pending, hashes):
+            values["hashed_password"] = hashed
+
+    def _insert(self, db: Session, records: list[tuple[int, dict, str | None]]) -> list[tuple[int, dict, str | None]]:
+        while records:
+            try:
+                db.execute(insert(User), [values for _, values, _ in records])
+                db.commit()
+                break
+            except IntegrityError:
+                # emails registered between the check and the insert: drop those and retry;
+                # every retry drops at least one row, and a conflict that is not an email is re-raised
+                db.rollback()
+                taken = self._taken(db, [values["email"] for _, values, _ in records])
+                if not taken:
+                    raise
+                records = self._drop_taken(records, taken)
+        return records
+
+    def _batches(self, rows: Iterable[tuple[int, dict | None]]) -> Iterator[list[tuple[int, dict | None]]]:
+        rows = iter(rows)
+        while batch := list(islice(rows, self.batch_size)):
+            yield batch
+
+    def _next_records(self, batches: Iterator[list[tuple[int, dict | None]]]) -> list[tuple[int, dict, str | None]] | None:
+        # reads (and parses) the next batch from the source, then validates it; None at the end
+        batch = next(batches, None)
+        return None if batch is None else self._validate(batch)
+
+    def run(self, db: Session, rows: Iterable[tuple[int, dict | None]]) -> Iterator[dict]:
+        """Import `rows`, yielding the running report after every batch."""
+        for batch in self._batches(rows):
+            records = self._validate(batch)
+            records = self._drop_taken(records, self._taken(db, [values["email"] for _, values, _ in records]))
+            self._hash_all(records)
+            self.report["created"] += len(self._insert(db, records))
+            yield self.report
+
+    async def run_async(self, db: Session | AsyncSession, rows: Iterable[tuple[int, dict | None]]) -> AsyncIterator[dict]:
+        # reading the upload, parsing, validating and waiting on hashes happen in worker
+        # threads, DB work goes through run_db: a large file never blocks the event loop
+        batches = self._batches(rows)
+        while (records := await run_in_threadpool(self._next_records, batches)) is not None:
+            taken = await run_db(db, self._taken, [values["email"] for _, values, _ in records])
+            records = self._drop_taken(records, taken)
+            await run_in_threadpool(self._hash_all, records)
+            self.report["created"] += len(await run_db(db, self._insert, records))
+            yield self.report
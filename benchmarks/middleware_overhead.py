@@ -0,0 +1,98 @@
+"""Per-request cost of the security-headers and rate-limit middleware.
+
+Compares a bare app, the old @app.middleware("http") (BaseHTTPMiddleware)
+implementation and the pure ASGI SecurityHeadersMiddleware, then slowapi's
+SlowAPIMiddleware (also a BaseHTTPMiddleware) and the pure ASGI
+RateLimitMiddleware, each checking a default limit on in-memory storage. The
+ASGI callable is driven directly, so the numbers contain no network or server
+overhead.
+
+Usage: python benchmarks/middleware_overhead.py [--requests N]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# add project path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from slowapi import Limiter
+from slowapi.middleware import SlowAPIMiddleware
+from slowapi.util import get_remote_address
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.middleware import BASE_SECURITY_HEADERS, RateLimitMiddleware, SecurityHeadersMiddleware
+
+async def ok(request):
+    return PlainTextResponse("ok")
+
+def bare_app():
+    return Starlette(routes=[Route("/", ok)])
+
+def base_http_app():
+    async def security_headers(request, call_next):
+        resp = await call_next(request)
+        for k, v in BASE_SECURITY_HEADERS.items():
+            resp.headers[k] = v
+        return resp
+    app = bare_app()
+    app.add_middleware(BaseHTTPMiddleware, dispatch=security_headers)
+    return app
+
+def pure_asgi_app():
+    app = bare_app()
+    app.add_middleware(SecurityHeadersMiddleware)
+    return app
+
+def rate_limited_app(middleware):
+    def factory():
+        app = bare_app()
+        # high enough that no request is refused: this measures the check, not the 429
+        app.state.limiter = Limiter(key_func=get_remote_address, default_limits=["1000000000/minute"])
+        app.add_middleware(middleware)
+        return app
+    return factory
+
+SCOPE = {
+    "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+    "scheme": "http", "path": "/", "raw_path": b"/", "root_path": "", "query_string": b"",
+    "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1234), "server": ("bench", 80),
+}
+
+async def drive(app, n: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(200):  # warm up
+        await app(dict(SCOPE), receive, send)
+    started = time.perf_counter()
+    for _ in range(n):
+        await app(dict(SCOPE), receive, send)
+    return (time.perf_counter() - started) / n * 1e6
+
+async def main(n: int):
+    results = {}
+    variants = (
+        ("bare", bare_app),
+        ("base_http_middleware", base_http_app),
+        ("pure_asgi", pure_asgi_app),
+        ("slowapi_base_http", rate_limited_app(SlowAPIMiddleware)),
+        ("slowapi_pure_asgi", rate_limited_app(RateLimitMiddleware)),
+    )
+    for name, factory in variants:
+        results[name] = await drive(factory(), n)
+    for name, us in results.items():
+        print(f"{name:>22}: {us:8.1f} us/request  (+{us - results['bare']:.1f} us over bare)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    asyncio.run(main(parser.parse_args().requests))
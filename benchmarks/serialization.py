@@ -0,0 +1,131 @@
+"""Per-request response serialization cost of the token and /users/me responses.
+
+Each variant is a one-route FastAPI app driven through its ASGI callable (no
+network, no DB), so the difference between variants is validation plus JSON
+rendering. Token responses: the dict the routers return vs a model_construct()
+instance. /users/me: the old UserOut.from_orm_user() path (model built by hand,
+then validated again by response_model) vs returning the ORM user to the
+from_attributes UserOut. The "orjson" variants set ORJSONResponse as the default
+response class, which turns off FastAPI's Pydantic-to-JSON fast path.
+
+Reports the best of --repeat timed rounds to damp scheduler noise.
+
+Usage: python benchmarks/serialization.py [--requests N] [--repeat R]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+import warnings
+from datetime import datetime, timezone
+
+# add project path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi import FastAPI
+from pydantic import BaseModel, EmailStr
+
+from app.models.user import Role, User
+from app.schemas.auth import TokenOut
+from app.schemas.user import UserOut
+
+TOKENS = {"access_token": "a" * 600, "refresh_token": "r" * 640}
+USER = User(
+    id=uuid.uuid4(), email="bench@example.com", full_name="Bench User", hashed_password="x",
+    is_active=True, role=Role.user, email_verified_at=datetime.now(timezone.utc), token_version=0,
+)
+
+class LegacyUserOut(BaseModel):
+    # UserOut before from_attributes: built by hand, then validated again by response_model
+    email: EmailStr
+    full_name: str | None = None
+    id: str
+    is_active: bool
+    role: Role
+    email_verified: bool
+
+    @classmethod
+    def from_orm_user(cls, u):
+        return cls(id=str(u.id), email=u.email, full_name=u.full_name, is_active=u.is_active, role=u.role.value, email_verified=bool(u.email_verified_at))
+
+def _tokens_dict():
+    return {**TOKENS, "token_type": "bearer", "expires_in": 900}
+
+def _tokens_model():
+    return TokenOut.model_construct(**TOKENS, token_type="bearer", expires_in=900)
+
+# the first variant of each response is the baseline
+VARIANTS = {
+    "tokens": {
+        "dict": (TokenOut, _tokens_dict),
+        "model_construct": (TokenOut, _tokens_model),
+        "dict+orjson": (TokenOut, _tokens_dict),
+    },
+    "me": {
+        "from_orm_user": (LegacyUserOut, lambda: LegacyUserOut.from_orm_user(USER)),
+        "from_attributes": (UserOut, lambda: USER),
+        "from_attributes+orjson": (UserOut, lambda: USER),
+    },
+}
+
+def build(name: str, response_model, handler) -> FastAPI | None:
+    kwargs = {}
+    if name.endswith("+orjson"):
+        try:
+            import orjson  # noqa: F401
+        except ImportError:
+            return None
+        from fastapi.responses import ORJSONResponse
+        kwargs["default_response_class"] = ORJSONResponse
+    app = FastAPI(**kwargs)
+
+    async def endpoint():
+        return handler()
+
+    app.add_api_route("/", endpoint, methods=["GET"], response_model=response_model)
+    return app
+
+SCOPE = {
+    "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+    "scheme": "http", "path": "/", "raw_path": b"/", "root_path": "", "query_string": b"",
+    "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1234), "server": ("bench", 80),
+}
+
+async def drive(app, n: int, repeat: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(200):  # warm up
+        await app(dict(SCOPE), receive, send)
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(n):
+            await app(dict(SCOPE), receive, send)
+        best = min(best, time.perf_counter() - started)
+    return best / n * 1e6
+
+async def main(n: int, repeat: int):
+    for response, variants in VARIANTS.items():
+        results = {}
+        for name, (model, handler) in variants.items():
+            app = build(name, model, handler)
+            if app is not None:
+                results[name] = await drive(app, n, repeat)
+        baseline = next(iter(results.values()))
+        for name, us in results.items():
+            print(f"{response:>7} {name:>23}: {us:8.1f} us/request  ({us - baseline:+.1f} us)")
+
+if __name__ == "__main__":
+    # ORJSONResponse warns on every response in this FastAPI version
+    warnings.simplefilter("ignore")
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000, help="requests per timed round")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.repeat))
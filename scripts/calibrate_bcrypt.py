@@ -0,0 +1,49 @@
+"""Pick a bcrypt cost for this host, or report how far existing hashes have migrated to it.
+
+Usage: python scripts/calibrate_bcrypt.py [--target-ms 250] [--min-rounds 10] [--max-rounds 16] [--samples 3]
+       python scripts/calibrate_bcrypt.py --progress
+"""
+import argparse
+import json
+import os
+import sys
+
+# add project path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.security import calibrate_bcrypt_rounds
+
+def calibrate(args):
+    chosen, timings = calibrate_bcrypt_rounds(args.target_ms / 1000, args.min_rounds, args.max_rounds, args.samples)
+    for rounds, seconds in timings.items():
+        marker = "  <- chosen" if rounds == chosen else ""
+        print(f"rounds={rounds:<3} verify={seconds * 1000:8.1f} ms  ~{1 / seconds:6.1f} logins/s per hashing worker{marker}")
+    if timings[chosen] > args.target_ms / 1000:
+        print(f"warning: even {chosen} rounds exceeds {args.target_ms} ms on this host; add HASH_WORKERS or hardware instead of lowering the cost")
+    print(f"BCRYPT_ROUNDS={chosen}")
+
+def progress():
+    from app.db.session import SessionLocal
+    from app.services.rehash import hash_cost_report
+
+    db = SessionLocal()
+    try:
+        print(json.dumps(hash_cost_report(db)))
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target-ms", type=float, default=250.0, help="verify latency budget per login")
+    parser.add_argument("--min-rounds", type=int, default=10)
+    parser.add_argument("--max-rounds", type=int, default=16)
+    parser.add_argument("--samples", type=int, default=3)
+    parser.add_argument("--progress", action="store_true", help="report users per bcrypt cost against BCRYPT_ROUNDS")
+    args = parser.parse_args()
+    if args.progress:
+        progress()
+    else:
+        calibrate(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""Create the email_outbox table and its indexes in an existing database.
+
+Safe to re-run: the table and indexes are only created when missing. Deploy this
+before the release that queues mail, or registration and password resets fail
+on the missing table.
+
+Usage: python scripts/migrate_email_outbox.py
+"""
+import argparse
+import json
+import os
+import sys
+
+# add project path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.session import get_engine
+from app.services.outbox import ensure_outbox_schema
+
+def main():
+    argparse.ArgumentParser(description=__doc__.splitlines()[0]).parse_args()
+    print(json.dumps({"table_created": ensure_outbox_schema(get_engine())}))
+
+if __name__ == "__main__":
+    main()
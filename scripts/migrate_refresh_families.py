@@ -0,0 +1,32 @@
+"""Add refresh-token families to an existing database and backfill them from parent_jti chains.
+
+Safe to re-run: the column and indexes are only created when missing and only rows
+without a family are updated.
+
+Usage: python scripts/migrate_refresh_families.py [--batch-size N]
+"""
+import argparse
+import json
+import os
+import sys
+
+# add project path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.session import SessionLocal, get_engine
+from app.services.token_families import backfill_families, ensure_family_schema
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    altered = ensure_family_schema(get_engine())
+    db = SessionLocal()
+    try:
+        backfilled = backfill_families(db, args.batch_size)
+    finally:
+        db.close()
+    print(json.dumps({"column_added": altered, "backfilled": backfilled}))
+
+if __name__ == "__main__":
+    main()
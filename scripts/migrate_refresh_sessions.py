@@ -0,0 +1,25 @@
+"""Add session metadata columns and the (user_id, revoked, expires_at) index to refresh_tokens.
+
+Safe to re-run: columns and indexes are only created when missing. The old single-column
+user_id index is dropped, since the composite index leads with user_id. Rows issued before
+this migration list with empty user agent, IP and last-used fields until they rotate.
+
+Usage: python scripts/migrate_refresh_sessions.py
+"""
+import argparse
+import json
+import os
+import sys
+
+# add project path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.session import get_engine
+from app.services.sessions import ensure_session_schema
+
+def main():
+    argparse.ArgumentParser(description=__doc__.splitlines()[0]).parse_args()
+    print(json.dumps({"columns_added": ensure_session_schema(get_engine())}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""Add the token-state columns (token_version, tokens_valid_after) to an existing users table.
+
+Safe to re-run: columns are only added when missing. Existing users start at
+token_version 0, which is what the access tokens they already hold carry, and
+with no logout-all watermark, so none of those tokens is rejected.
+
+Usage: python scripts/migrate_user_tokens.py
+"""
+import argparse
+import json
+import os
+import sys
+
+# add project path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.session import get_engine
+from app.services.user_cache import ensure_user_token_schema
+
+def main():
+    argparse.ArgumentParser(description=__doc__.splitlines()[0]).parse_args()
+    print(json.dumps({"columns_added": ensure_user_token_schema(get_engine())}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""Delete expired refresh tokens, blacklist entries, email tokens and outbox mail.
+
+Usage: python scripts/purge_expired.py [--batch-size N] [--pause SECONDS]
+"""
+import argparse
+import json
+import os
+import sys
+
+# add project path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.session import SessionLocal
+from app.services.retention import run_purge
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--pause", type=float, default=None, help="seconds to sleep between batches")
+    args = parser.parse_args()
+    report = run_purge(SessionLocal, batch_size=args.batch_size, pause=args.pause)
+    print(json.dumps(report))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Send the queued email in email_outbox, for deployments with EMAIL_OUTBOX_ENABLED=false.
+
+Without --loop it sends everything due and exits (run it from cron); with --loop it
+keeps polling every EMAIL_OUTBOX_POLL_SECONDS, like the in-app worker. Each run's
+report (JSON) goes to stdout.
+
+Usage: python scripts/send_outbox.py [--batch-size N] [--loop]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+# add project path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.outbox import drain_outbox, make_sender
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--loop", action="store_true", help="keep polling instead of exiting once the outbox is drained")
+    args = parser.parse_args()
+    sender = make_sender()
+    try:
+        while True:
+            report = drain_outbox(SessionLocal, sender, args.batch_size)
+            if not args.loop:
+                print(json.dumps(report))
+                return
+            if report["sent"] or report["failed"]:
+                print(json.dumps(report), flush=True)
+            time.sleep(settings.EMAIL_OUTBOX_POLL_SECONDS)
+    finally:
+        sender.close()
+
+if __name__ == "__main__":
+    main()
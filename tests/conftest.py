@@ -0,0 +1,55 @@
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import config
+from app.db.base import Base
+from app.db.session import get_db
+from app.main import create_app  # also registers every model on Base.metadata
+
+
+@pytest.fixture
+def restore_settings():
+    # for tests that call create_app(Settings(...)): later tests get the previous settings back
+    previous = config.get_settings()
+    yield
+    create_app(previous)
+
+
+@pytest.fixture
+def engine():
+    # in-memory SQLite on one shared connection, so every session and thread sees the
+    # same database; no tables yet, for tests that build an old schema themselves
+    engine = create_engine("sqlite+pysqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool, future=True)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine) -> sessionmaker:
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def app(session_factory) -> FastAPI:
+    # a fresh app per test also resets rate-limit counters, lockouts and caches
+    def override_get_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app = create_app()
+    app.dependency_overrides[get_db] = override_get_db
+    return app
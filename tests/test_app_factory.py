@@ -0,0 +1,12 @@
+from app.core.config import Settings
+from app.core.hashing import hashing_pool
+from app.db import session
+from app.main import create_app
+
+
+def test_create_app_uses_given_settings_and_builds_nothing(restore_settings):
+    hashing_pool.stats()  # build one singleton so the reset is observable
+    app = create_app(Settings(DATABASE_URL="sqlite://", JWT_SECRET_KEY="k" * 32, APP_NAME="Factory", HASH_WORKERS=3))
+    assert app.title == "Factory"
+    assert "sync" not in session.pool_metrics
+    assert hashing_pool.stats()["workers"] == 3
@@ -0,0 +1,34 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.main import create_app
+from app.db.base import Base
+from app.db.session import get_db
+
+# aiosqlite stand-in for asyncpg
+engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+AsyncTestingSessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+async def override_get_async_db():
+    async with AsyncTestingSessionLocal() as db:
+        yield db
+
+@pytest.mark.asyncio
+async def test_async_session_flow():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    app = create_app()
+    app.dependency_overrides[get_db] = override_get_async_db
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            r = await client.post("/auth/register", json={"email": "async@example.com", "password": "StrongPass1"})
+            assert r.status_code == 201
+            r = await client.post("/auth/login", json={"email": "async@example.com", "password": "StrongPass1"})
+            assert r.status_code == 200
+            headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+            r = await client.get("/users/me", headers=headers)
+            assert r.status_code == 200 and r.json()["email"] == "async@example.com"
+    finally:
+        await engine.dispose()
@@ -2,36 +2,9 @@ import asyncio
 import uuid
 import pytest
 from httpx import AsyncClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from fastapi import FastAPI, Depends
-
-from app.main import app as real_app
-from app.db.base import Base
-from app.db.session import get_db
-
-# SQLite test DB
-engine = create_engine("sqlite+pysqlite:///:memory:", connect_args={"check_same_thread": False}, future=True)
-TestingSessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
-
-@pytest.fixture(autouse=True, scope="session")
-def create_db():
-    Base.metadata.create_all(bind=engine)
-    yield
-    Base.metadata.drop_all(bind=engine)
-
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+from fastapi import FastAPI
 
-@pytest.fixture
-def app() -> FastAPI:
-    app = real_app
-    app.dependency_overrides[get_db] = override_get_db
-    return app
+from app.services.user_cache import user_cache
 
 @pytest.mark.asyncio
 async def test_register_login_me(app: FastAPI):
@@ -48,9 +21,163 @@ async def test_register_login_me(app: FastAPI):
         assert r.status_code == 200
         tokens = r.json()
         assert "access_token" in tokens and "refresh_token" in tokens
+        assert tokens["token_type"] == "bearer" and tokens["expires_in"] == 60 * 15
         # me
         headers = {"Authorization": f"Bearer {tokens['access_token']}"}
         r = await client.get("/users/me", headers=headers)
         assert r.status_code == 200
         me = r.json()
         assert me["email"] == "test@example.com"
+        assert set(me) == {"id", "email", "full_name", "is_active", "role", "email_verified"}
+        assert str(uuid.UUID(me["id"])) == me["id"] and me["role"] == "user" and me["email_verified"] is False
+
+@pytest.mark.asyncio
+async def test_logout_revokes_access_token(app: FastAPI):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.post("/auth/register", json={"email": "logout@example.com", "password": "StrongPass1"})
+        r = await client.post("/auth/login", json={"email": "logout@example.com", "password": "StrongPass1"})
+        tokens = r.json()
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        assert (await client.get("/users/me", headers=headers)).status_code == 200
+        r = await client.post("/auth/logout", headers=headers)
+        assert r.status_code == 204
+        r = await client.get("/users/me", headers=headers)
+        assert r.status_code == 401
+        assert r.json()["detail"]["code"] == "token_revoked"
+
+@pytest.mark.asyncio
+async def test_refresh_rotation_rejects_reuse(app: FastAPI):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        r = await client.post("/auth/register", json={"email": "rotate@example.com", "password": "StrongPass1"})
+        assert r.status_code == 201
+        r = await client.post("/auth/register", json={"email": "rotate@example.com", "password": "StrongPass1"})
+        assert r.status_code == 409
+        r = await client.post("/auth/login", json={"email": "rotate@example.com", "password": "StrongPass1"})
+        refresh = r.json()["refresh_token"]
+        r = await client.post("/auth/refresh", json={"refresh_token": refresh})
+        assert r.status_code == 200
+        assert r.json()["refresh_token"] != refresh
+        rotated = r.json()["refresh_token"]
+        r = await client.post("/auth/refresh", json={"refresh_token": refresh})
+        assert r.status_code == 401
+        assert r.json()["detail"]["code"] == "refresh_revoked"
+        # the replay revoked the whole family, including the token rotated from it
+        r = await client.post("/auth/refresh", json={"refresh_token": rotated})
+        assert r.status_code == 401
+
+@pytest.mark.asyncio
+async def test_email_token_is_single_use(app: FastAPI, db):
+    from app.models.user import User
+    from app.models.email_token import EmailTokenPurpose
+    from app.services.auth import create_email_token
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.post("/auth/register", json={"email": "verify@example.com", "password": "StrongPass1"})
+        user = db.query(User).filter(User.email == "verify@example.com").first()
+        token = create_email_token(db, user, EmailTokenPurpose.verify_email)
+        r = await client.post("/auth/verify-email", json={"token": token})
+        assert r.status_code == 204
+        r = await client.post("/auth/verify-email", json={"token": token})
+        assert r.status_code == 400
+        r = await client.post("/auth/login", json={"email": "verify@example.com", "password": "StrongPass1"})
+        r = await client.get("/users/me", headers={"Authorization": f"Bearer {r.json()['access_token']}"})
+        assert r.json()["email_verified"] is True
+
+@pytest.mark.asyncio
+async def test_introspect_batch_preserves_order(app: FastAPI, monkeypatch):
+    from app.core.config import get_settings
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.post("/auth/register", json={"email": "gateway@example.com", "password": "StrongPass1"})
+        first = (await client.post("/auth/login", json={"email": "gateway@example.com", "password": "StrongPass1"})).json()
+        second = (await client.post("/auth/login", json={"email": "gateway@example.com", "password": "StrongPass1"})).json()
+        await client.post("/auth/logout", headers={"Authorization": f"Bearer {second['access_token']}"})
+        batch = {"tokens": [first["access_token"], "not-a-jwt", second["access_token"], first["refresh_token"]]}
+        # closed until a gateway token is configured
+        r = await client.post("/auth/introspect", json=batch)
+        assert r.status_code == 403 and r.json()["detail"]["code"] == "introspection_disabled"
+        monkeypatch.setattr(get_settings(), "INTROSPECTION_TOKEN", "gateway-secret")
+        r = await client.post("/auth/introspect", json=batch)
+        assert r.status_code == 403 and r.json()["detail"]["code"] == "forbidden"
+        r = await client.post("/auth/introspect", json=batch, headers={"X-Introspection-Token": "gateway-secret"})
+        assert r.status_code == 200
+        results = r.json()["results"]
+        assert results[0]["active"] is True and results[0]["claims"]["type"] == "access"
+        assert [x["reason"] for x in results[1:]] == ["invalid_token", "token_revoked", "wrong_token_type"]
+
+@pytest.mark.asyncio
+async def test_login_is_limited_per_account(app: FastAPI, monkeypatch):
+    from app.core.config import get_settings, settings
+    # a day-long window cannot roll over mid-test, and the budget stays under the lockout threshold
+    monkeypatch.setattr(get_settings(), "RATE_LIMIT_LOGIN_PER_EMAIL", "3/day")
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        budget = int(settings.RATE_LIMIT_LOGIN_PER_EMAIL.split("/")[0])
+        assert budget < settings.LOGIN_LOCKOUT_THRESHOLD
+        for _ in range(budget):
+            r = await client.post("/auth/login", json={"email": "busy@example.com", "password": "WrongPass1"})
+            assert r.status_code == 401
+        # the per-email key is case-insensitive
+        r = await client.post("/auth/login", json={"email": "Busy@example.com", "password": "WrongPass1"})
+        assert r.status_code == 429
+        assert r.json()["detail"]["code"] == "rate_limited"
+        assert (await client.get("/health")).status_code == 200
+
+@pytest.mark.asyncio
+async def test_failed_logins_lock_account_before_bcrypt(app: FastAPI, monkeypatch):
+    from app.core.config import settings
+    from app.services import auth as auth_service
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.post("/auth/register", json={"email": "victim@example.com", "password": "StrongPass1"})
+        for _ in range(settings.LOGIN_LOCKOUT_THRESHOLD):
+            r = await client.post("/auth/login", json={"email": "victim@example.com", "password": "WrongPass1"})
+            assert r.status_code == 401
+
+        async def no_bcrypt(*args):
+            raise AssertionError("bcrypt must not run for a locked account")
+        monkeypatch.setattr(auth_service, "verify_password_async", no_bcrypt)
+        r = await client.post("/auth/login", json={"email": "victim@example.com", "password": "StrongPass1"})
+        assert r.status_code == 429
+        assert r.json()["detail"]["code"] == "login_locked"
+        assert int(r.headers["Retry-After"]) > 0
+
+@pytest.mark.asyncio
+async def test_logout_all_revokes_every_session(app: FastAPI):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.post("/auth/register", json={"email": "everywhere@example.com", "password": "StrongPass1"})
+        login = {"email": "everywhere@example.com", "password": "StrongPass1"}
+        laptop = (await client.post("/auth/login", json=login)).json()
+        phone = (await client.post("/auth/login", json=login)).json()
+        me = (await client.get("/users/me", headers={"Authorization": f"Bearer {laptop['access_token']}"})).json()
+        stale = user_cache.get(uuid.UUID(me["id"]))
+        # no sleep: tokens minted earlier in the same second are revoked as well
+        r = await client.post("/auth/logout-all", headers={"Authorization": f"Bearer {laptop['access_token']}"})
+        assert r.status_code == 204
+        for tokens in (laptop, phone):
+            r = await client.get("/users/me", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+            assert r.status_code == 401 and r.json()["detail"]["code"] == "token_revoked"
+        # another worker's cache still holds the pre-logout user; refresh must not trust it
+        user_cache.put(stale)
+        for tokens in (laptop, phone):
+            r = await client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+            assert r.status_code == 401 and r.json()["detail"]["code"] == "refresh_revoked"
+        fresh = (await client.post("/auth/login", json=login)).json()
+        r = await client.get("/users/me", headers={"Authorization": f"Bearer {fresh['access_token']}"})
+        assert r.status_code == 200
+
+@pytest.mark.asyncio
+async def test_logout_all_from_cached_user_never_lowers_token_version(app: FastAPI, session_factory):
+    from app.models.user import User
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.post("/auth/register", json={"email": "versions@example.com", "password": "StrongPass1"})
+        tokens = (await client.post("/auth/login", json={"email": "versions@example.com", "password": "StrongPass1"})).json()
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        user_id = uuid.UUID((await client.get("/users/me", headers=headers)).json()["id"])
+        # another worker bumps the version; this worker's cache still holds the old row
+        db = session_factory()
+        db.get(User, user_id).token_version += 5
+        db.commit()
+        before = db.get(User, user_id).token_version
+        db.close()
+        assert user_cache.get(user_id).token_version < before
+        assert (await client.post("/auth/logout-all", headers=headers)).status_code == 204
+        db = session_factory()
+        assert db.get(User, user_id).token_version == before + 1
+        db.close()
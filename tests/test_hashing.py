@@ -0,0 +1,48 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+
+from app.core.hashing import HashingPool
+
+
+@pytest.mark.asyncio
+async def test_hashing_pool_rejects_when_full():
+    pool = HashingPool("thread", workers=1, queue_size=1)
+    gate = threading.Event()
+    busy = [asyncio.ensure_future(pool.run(gate.wait)) for _ in range(2)]
+    await asyncio.sleep(0.05)
+    with pytest.raises(HTTPException) as exc:
+        await pool.run(gate.wait)
+    assert exc.value.status_code == 503
+    assert pool.stats()["queue_depth"] == 1
+    gate.set()
+    await asyncio.gather(*busy)
+    stats = pool.stats()
+    assert stats["completed"] == 2 and stats["rejected"] == 1
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_keeps_the_slot_until_the_hash_finishes():
+    pool = HashingPool("thread", workers=1, queue_size=0)
+    gate = threading.Event()
+    waiting = asyncio.ensure_future(pool.run(gate.wait))
+    try:
+        await asyncio.sleep(0.05)
+        waiting.cancel()  # e.g. the client disconnected mid-login
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        # the worker is still hashing, so a new job is refused rather than queued behind it
+        assert pool.stats()["in_flight"] == 1
+        with pytest.raises(HTTPException):
+            await pool.run(gate.wait)
+    finally:
+        gate.set()
+    for _ in range(100):
+        if pool.stats()["in_flight"] == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert pool.stats()["in_flight"] == 0
+    assert await pool.run(len, "ok") == 2
+    pool.shutdown()
@@ -0,0 +1,43 @@
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+from app.core.keys import KeyRing
+
+
+def _write_key(path, key, public_only=False):
+    if public_only:
+        data = key.public_key().public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+    else:
+        data = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    path.write_bytes(data)
+
+
+def test_keyring_rotation_by_kid(tmp_path):
+    old, new = rsa.generate_private_key(65537, 2048), rsa.generate_private_key(65537, 2048)
+    _write_key(tmp_path / "2025-01.pem", old, public_only=True)
+    _write_key(tmp_path / "2026-01.pem", new)
+    ring = KeyRing("RS256", str(tmp_path), "2026-01")
+
+    kid, key = ring.signing_key()
+    token = jwt.encode({"sub": "x"}, key, algorithm="RS256", headers={"kid": kid})
+    assert jwt.decode(token, ring.verification_key(kid), algorithms=["RS256"])["sub"] == "x"
+
+    retired = jwt.encode({"sub": "y"}, old, algorithm="RS256", headers={"kid": "2025-01"})
+    assert jwt.decode(retired, ring.verification_key("2025-01"), algorithms=["RS256"])["sub"] == "y"
+    with pytest.raises(jwt.InvalidTokenError):
+        ring.verification_key("unknown")
+
+    assert {k["kid"] for k in ring.jwks()["keys"]} == {"2025-01", "2026-01"}
+    assert all("d" not in k for k in ring.jwks()["keys"])  # never publish private parts
+
+
+def test_keyring_eddsa(tmp_path):
+    _write_key(tmp_path / "ed1.pem", ed25519.Ed25519PrivateKey.generate())
+    ring = KeyRing("EdDSA", str(tmp_path), None)
+    kid, key = ring.signing_key()
+    assert kid == "ed1"
+    token = jwt.encode({"sub": "z"}, key, algorithm="EdDSA", headers={"kid": kid})
+    assert jwt.decode(token, ring.verification_key(kid), algorithms=["EdDSA"])["sub"] == "z"
+    assert ring.jwks()["keys"][0]["kty"] == "OKP"
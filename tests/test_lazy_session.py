@@ -0,0 +1,32 @@
+import pytest
+from httpx import AsyncClient
+
+from app.core.security import create_jwt_token
+from app.db import session
+from app.db.session import LazySession, get_db
+from app.main import create_app
+
+
+@pytest.mark.asyncio
+async def test_get_db_builds_no_session_until_used():
+    gen = get_db()
+    db = await gen.__anext__()
+    assert isinstance(db, LazySession) and db.session is None
+    with pytest.raises(StopAsyncIteration):
+        await gen.__anext__()
+    assert db.session is None
+
+
+@pytest.mark.asyncio
+async def test_rejected_tokens_never_touch_the_pool():
+    app = create_app()
+    expired = create_jwt_token("00000000-0000-0000-0000-000000000000", "access", minutes=-1)["token"]
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        r = await client.get("/users/me", headers={"Authorization": "Bearer not-a-jwt"})
+        assert r.status_code == 401 and r.json()["detail"]["code"] == "invalid_token"
+        r = await client.get("/users/me", headers={"Authorization": f"Bearer {expired}"})
+        assert r.status_code == 401 and r.json()["detail"]["code"] == "token_expired"
+        r = await client.post("/auth/logout")
+        assert r.status_code == 204
+    # the engine (and its pool) is only created when a session is first used
+    assert "sync" not in session.pool_metrics
@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+from app.services.lockout import LoginFailureTracker, MemoryFailureStore, SQLiteFailureStore
+
+
+def _tracker(store):
+    return LoginFailureTracker(store, enabled=True, email_threshold=2, ip_threshold=3, base=10, max_lock=25, window=60)
+
+
+def test_lockout_backoff_grows_and_is_capped():
+    tracker = _tracker(MemoryFailureStore(max_keys=100))
+    tracker.record_failure("a@example.com")
+    assert tracker.store.get("email:a@example.com")[1] == 0.0
+    tracker.record_failure("a@example.com")
+    failures, locked_until, last = tracker.store.get("email:a@example.com")
+    assert failures == 2 and locked_until - last == 10
+    tracker.record_failure("a@example.com")
+    assert tracker.store.get("email:a@example.com")[1] - last >= 20
+    tracker.record_failure("a@example.com")
+    failures, locked_until, last = tracker.store.get("email:a@example.com")
+    assert locked_until - last == 25  # capped
+    tracker.record_success("a@example.com")
+    assert tracker.store.get("email:a@example.com") is None
+
+
+def test_memory_store_is_bounded():
+    store = MemoryFailureStore(max_keys=2)
+    tracker = _tracker(store)
+    for email in ("a@x.io", "b@x.io", "c@x.io"):
+        tracker.record_failure(email)
+    assert store.get("email:a@x.io") is None and store.get("email:c@x.io") is not None
+
+
+def test_sqlite_store_shared_between_workers(tmp_path):
+    path = str(tmp_path / "lockout.db")
+    worker_a, worker_b = _tracker(SQLiteFailureStore(path, 60)), _tracker(SQLiteFailureStore(path, 60))
+    worker_a.record_failure("a@example.com", "10.0.0.1")
+    worker_b.record_failure("a@example.com", "10.0.0.1")
+    assert worker_a.store.get("email:a@example.com")[0] == 2
+    assert worker_a.store.get("email:a@example.com")[1] > 0
+    assert worker_b.store.get("ip:10.0.0.1")[0] == 2
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_calls_leave_the_event_loop(tmp_path):
+    loop_thread = threading.get_ident()
+    threads = []
+
+    def probe():
+        threads.append(threading.get_ident())
+
+    await _tracker(SQLiteFailureStore(str(tmp_path / "lockout.db"), 60)).run_async(probe)
+    await _tracker(MemoryFailureStore(max_keys=10)).run_async(probe)
+    # SQLite may wait on another worker's write lock; the in-memory store never blocks
+    assert threads[0] != loop_thread and threads[1] == loop_thread
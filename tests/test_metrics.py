@@ -0,0 +1,51 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import create_engine, text
+
+from app.core.config import get_settings
+from app.core.metrics import Histogram, db_queries, instrument_engine, request_latency, stage_latency
+from app.core.security import create_jwt_token, decode_jwt
+from app.main import create_app
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = Histogram("t_seconds", "test", ("route",), buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 5.0):
+        h.observe(v, "/a")
+    lines = h.render()
+    assert 't_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 't_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 't_seconds_count{route="/a"} 3' in lines
+
+
+def test_engine_queries_are_counted():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    before = db_queries.value("SELECT")
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        conn.execute(text("SELECT 2"))
+    assert db_queries.value("SELECT") == before + 2
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_reports_routes_and_stages(monkeypatch):
+    monkeypatch.setattr(get_settings(), "INTERNAL_STATS_TOKEN", "ops-secret")
+    async with AsyncClient(app=create_app(), base_url="http://test") as client:
+        before = request_latency.count("GET", "/health", "200")
+        await client.get("/health")
+        assert request_latency.count("GET", "/health", "200") == before + 1
+        assert (await client.get("/metrics")).status_code == 403
+        r = await client.get("/metrics", headers={"X-Internal-Token": "ops-secret"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in r.text
+    assert "hashing_in_flight" in r.text
+
+
+def test_jwt_stages_are_timed():
+    signed, verified = stage_latency.count("jwt_sign"), stage_latency.count("jwt_verify")
+    decode_jwt(create_jwt_token("1", "access", minutes=5)["token"])
+    assert stage_latency.count("jwt_sign") == signed + 1
+    assert stage_latency.count("jwt_verify") == verified + 1
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from app.middleware import RateLimitMiddleware, SecurityHeadersMiddleware
+
+
+async def page(request):
+    return PlainTextResponse("ok", headers={"X-Frame-Options": "SAMEORIGIN"})
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("hsts", [False, True])
+async def test_security_headers_middleware(hsts):
+    app = Starlette(routes=[Route("/", page)])
+    app.add_middleware(SecurityHeadersMiddleware, hsts=hsts)
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        r = await client.get("/")
+    assert r.text == "ok"
+    assert r.headers["x-content-type-options"] == "nosniff"
+    assert r.headers.get_list("x-frame-options") == ["DENY"]
+    assert ("strict-transport-security" in r.headers) is hsts
+
+
+async def stream(request):
+    async def chunks():
+        yield b"a"
+        yield b"b"
+    return StreamingResponse(chunks())
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_middleware_streams_and_limits():
+    app = Starlette(routes=[Route("/", stream)])
+    app.state.limiter = Limiter(key_func=get_remote_address, default_limits=["2/minute"])
+    app.add_middleware(RateLimitMiddleware)
+    sent, requested = [], asyncio.Event()
+
+    async def receive():
+        if requested.is_set():
+            await asyncio.Event().wait()  # the client never disconnects
+        requested.set()
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message["type"])
+
+    scope = {"type": "http", "method": "GET", "path": "/", "root_path": "", "query_string": b"", "headers": [], "client": ("127.0.0.1", 1)}
+    await app(scope, receive, send)
+    # one start message however many body chunks the response has
+    assert sent == ["http.response.start"] + ["http.response.body"] * 3
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        assert (await client.get("/")).text == "ab"
+        assert (await client.get("/")).status_code == 429
@@ -0,0 +1,162 @@
+import email
+import email.policy
+import socketserver
+import threading
+import uuid
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import inspect
+
+from app.core.security import decode_jwt
+from app.models.email_outbox import EmailOutbox
+from app.models.email_token import EmailToken, EmailTokenPurpose
+from app.models.user import User
+from app.services import outbox
+from app.core.config import get_settings
+from app.services.outbox import LogSender, SMTPSender, _now, deliver_batch, drain_outbox, enqueue_email, ensure_outbox_schema, make_sender
+
+class SinkHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept messages; every DATA payload lands in server.messages."""
+
+    def reply(self, line: str):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 sink")
+        while line := self.rfile.readline():
+            verb = line.decode().strip().split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 sink")
+            elif verb == "DATA":
+                self.reply("354 go ahead")
+                data = []
+                while (chunk := self.rfile.readline()) not in (b".\r\n", b""):
+                    data.append(chunk.decode())
+                self.server.messages.append("".join(data))
+                self.reply("250 queued")
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+@pytest.fixture
+def smtp_sink():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), SinkHandler)
+    server.daemon_threads = True
+    server.messages, server.connections = [], 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _queue(db, n: int):
+    expires_at = _now() + timedelta(hours=1)
+    user = User(id=uuid.uuid4(), email="outbox@example.com", hashed_password="x", is_active=True, token_version=0)
+    db.add(user)
+    for i in range(n):
+        db.add(EmailToken(jti=f"jti-{i}", user_id=user.id, purpose=EmailTokenPurpose.verify_email, expires_at=expires_at, used=False))
+        enqueue_email(db, f"user{i}@example.com", EmailTokenPurpose.verify_email, f"jti-{i}", expires_at)
+    db.commit()
+
+
+def test_outbox_delivers_batches_over_one_connection(db, smtp_sink):
+    _queue(db, 3)
+    sender = SMTPSender("127.0.0.1", smtp_sink.server_address[1], None, None, False, "no-reply@example.com", 5)
+    assert deliver_batch(db, sender, batch_size=2) == {"sent": 2, "failed": 0}
+    assert deliver_batch(db, sender, batch_size=2) == {"sent": 1, "failed": 0}
+    assert deliver_batch(db, sender, batch_size=2) == {"sent": 0, "failed": 0}
+    sender.close()
+    assert smtp_sink.connections == 1
+    assert len(smtp_sink.messages) == 3
+    # the token is signed at send time for the queued jti; the outbox row never held it
+    token = email.message_from_string(smtp_sink.messages[0], policy=email.policy.default).get_content().split()[-1]
+    assert decode_jwt(token)["jti"] == "jti-0"
+    assert all(row.sent_at is not None for row in db.query(EmailOutbox).all())
+
+
+def test_outbox_commits_each_delivery(db):
+    class CrashesOnSecond:
+        def __init__(self):
+            self.sent = []
+
+        def send(self, to_address, subject, body):
+            if self.sent:
+                raise SystemExit("worker killed")
+            self.sent.append(to_address)
+
+    _queue(db, 2)
+    with pytest.raises(SystemExit):
+        deliver_batch(db, CrashesOnSecond())
+    db.rollback()
+    # the first message stays delivered, so a later run does not send it again
+    assert [row.sent_at is not None for row in db.query(EmailOutbox).order_by(EmailOutbox.to_address)] == [True, False]
+
+
+class Recorder:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, to_address, subject, body):
+        self.sent.append(to_address)
+
+
+def test_two_workers_reading_the_same_rows_send_each_once(db, session_factory, monkeypatch):
+    _queue(db, 2)
+    first, second = Recorder(), Recorder()
+    claim = outbox._claim
+
+    def claim_after_other_worker(db, rows, now):
+        # the other worker reads, claims and sends the same rows before this one claims
+        monkeypatch.setattr(outbox, "_claim", claim)
+        other = session_factory()
+        assert deliver_batch(other, second) == {"sent": 2, "failed": 0}
+        other.close()
+        return claim(db, rows, now)
+
+    monkeypatch.setattr(outbox, "_claim", claim_after_other_worker)
+    assert deliver_batch(db, first) == {"sent": 0, "failed": 0}
+    assert first.sent == [] and sorted(second.sent) == ["user0@example.com", "user1@example.com"]
+
+
+def test_outbox_failure_backs_off(db):
+    class Down:
+        def send(self, *args):
+            raise ConnectionRefusedError("smtp down")
+
+    _queue(db, 1)
+    assert deliver_batch(db, Down()) == {"sent": 0, "failed": 1}
+    row = db.query(EmailOutbox).one()
+    assert row.attempts == 1 and row.sent_at is None and "smtp down" in row.last_error
+    # not due again until the backoff passes
+    assert deliver_batch(db, Down()) == {"sent": 0, "failed": 0}
+    assert deliver_batch(db, Down(), now=_now() + timedelta(minutes=5)) == {"sent": 0, "failed": 1}
+
+
+def test_mail_is_only_logged_in_development(monkeypatch):
+    monkeypatch.setattr(get_settings(), "SMTP_HOST", None)
+    assert isinstance(make_sender(), LogSender)
+    monkeypatch.setattr(get_settings(), "ENV", "production")
+    with pytest.raises(RuntimeError, match="SMTP_HOST"):
+        make_sender()
+
+
+def test_drain_sends_everything_due(db, session_factory):
+    # what scripts/send_outbox.py runs when the in-app worker is off
+    _queue(db, 5)
+    sender = Recorder()
+    assert drain_outbox(session_factory, sender, batch_size=2) == {"sent": 5, "failed": 0}
+    assert len(sender.sent) == 5
+    assert drain_outbox(session_factory, sender, batch_size=2) == {"sent": 0, "failed": 0}
+
+
+def test_schema_upgrade_creates_outbox_table(engine):
+    assert ensure_outbox_schema(engine) is True
+    assert ensure_outbox_schema(engine) is False
+    indexes = {i["name"]: tuple(i["column_names"]) for i in inspect(engine).get_indexes("email_outbox")}
+    assert indexes["ix_email_outbox_pending"] == ("sent_at", "next_attempt_at")
+    assert indexes["ix_email_outbox_expires_at"] == ("expires_at",)
@@ -0,0 +1,38 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import QueuePool
+
+from app.core.config import get_settings
+from app.db.pool_metrics import PoolMetrics
+from app.db.session import get_engine
+from app.main import create_app
+
+
+def test_pool_metrics_track_checkouts_and_timeouts(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=QueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05)
+    metrics = PoolMetrics(engine)
+    conn = engine.connect()
+    stats = metrics.stats()
+    assert stats["in_use"] == 1 and stats["connects"] == 1 and stats["checkouts"] == 1
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    assert metrics.stats()["timeouts"] == 1
+    conn.close()
+    assert metrics.stats()["in_use"] == 0
+    engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_internal_stats_endpoint(monkeypatch):
+    app = create_app()
+    get_engine()  # pools are reported once the lazily created engine exists
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        r = await client.get("/internal/stats")
+        assert r.status_code == 403 and r.json()["detail"]["code"] == "internal_token_unset"
+        monkeypatch.setattr(get_settings(), "INTERNAL_STATS_TOKEN", "ops-secret")
+        assert (await client.get("/internal/stats")).status_code == 403
+        r = await client.get("/internal/stats", headers={"X-Internal-Token": "ops-secret"})
+        assert r.status_code == 200
+        body = r.json()
+        assert "sync" in body["db_pool"] and "queue_depth" in body["hashing"]
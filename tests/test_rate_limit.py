@@ -0,0 +1,38 @@
+import sqlite3
+import time
+
+from limits import parse
+from limits.strategies import SlidingWindowCounterRateLimiter
+
+from app.core.rate_limit import SQLiteStorage
+
+
+def test_sqlite_storage_shares_counters_between_workers(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'ratelimit.db'}"
+    # two storages on one file stand in for two worker processes
+    worker_a = SlidingWindowCounterRateLimiter(SQLiteStorage(uri))
+    worker_b = SlidingWindowCounterRateLimiter(SQLiteStorage(uri))
+    limit = parse("3/minute")
+    assert worker_a.hit(limit, "login", "a@example.com")
+    assert worker_b.hit(limit, "login", "a@example.com")
+    assert worker_a.hit(limit, "login", "a@example.com")
+    assert not worker_b.hit(limit, "login", "a@example.com")
+    assert worker_b.hit(limit, "login", "b@example.com")
+    assert worker_a.get_window_stats(limit, "login", "a@example.com").remaining == 0
+
+
+def test_sqlite_storage_bounds_lock_waits(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'ratelimit.db'}"
+    fail_open = SlidingWindowCounterRateLimiter(SQLiteStorage(uri, busy_timeout=0.02))
+    fail_closed = SlidingWindowCounterRateLimiter(SQLiteStorage(uri, busy_timeout=0.02, fail_open=False))
+    # another worker holding the write lock
+    holder = sqlite3.connect(tmp_path / "ratelimit.db", isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    limit = parse("1/minute")
+    started = time.perf_counter()
+    assert fail_open.hit(limit, "login", "a@example.com") and fail_open.hit(limit, "login", "a@example.com")
+    assert not fail_closed.hit(limit, "login", "b@example.com")
+    assert time.perf_counter() - started < 1
+    holder.execute("ROLLBACK")
+    # nothing was counted while the store was busy
+    assert fail_closed.hit(limit, "login", "a@example.com")
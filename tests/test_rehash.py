@@ -0,0 +1,35 @@
+import uuid
+
+import pytest
+from passlib.context import CryptContext
+
+from app.core.security import bcrypt_cost, calibrate_bcrypt_rounds, pwd_context, target_bcrypt_rounds, verify_password
+from app.models.user import User
+from app.services.rehash import hash_cost_report, schedule_rehash
+
+cheap = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4)
+
+
+def test_calibration_stops_at_the_budget():
+    chosen, timings = calibrate_bcrypt_rounds(target_seconds=60, min_rounds=4, max_rounds=5, samples=1)
+    assert chosen == 5 and set(timings) == {4, 5}
+    chosen, _ = calibrate_bcrypt_rounds(target_seconds=0, min_rounds=4, max_rounds=6, samples=1)
+    assert chosen == 4
+
+
+@pytest.mark.asyncio
+async def test_outdated_hash_is_upgraded_after_login(db):
+    user = User(id=uuid.uuid4(), email=f"{uuid.uuid4().hex}@example.com", hashed_password=cheap.hash("StrongPass1"), is_active=True, token_version=0)
+    db.add(user)
+    db.commit()
+    assert hash_cost_report(db)["outdated"] == 1
+
+    task = schedule_rehash(db, user, "StrongPass1")
+    assert task is not None
+    await task
+    db.expire_all()
+    stored = db.get(User, user.id).hashed_password
+    assert bcrypt_cost(stored) == target_bcrypt_rounds() and verify_password("StrongPass1", stored)
+    assert not pwd_context.needs_update(stored)
+    report = hash_cost_report(db)
+    assert report["outdated"] == 0 and report["progress"] == 1.0
@@ -0,0 +1,109 @@
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.core.config import Settings
+from app.core.security import hash_password
+from app.db.base import Base
+from app.db.replicas import ReplicaSet, RoutingSession, read_only
+from app.db.session import get_engine, get_replicas
+from app.main import create_app
+from app.models.token import RefreshToken
+from app.models.user import User
+from app.services.auth import get_user, get_user_by_email
+
+
+def _database(path, *users: User) -> str:
+    url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.add_all(users)
+        db.commit()
+    engine.dispose()
+    return url
+
+
+def _user(user_id: uuid.UUID, full_name: str, hashed: str) -> User:
+    return User(id=user_id, email="replica@example.com", full_name=full_name, hashed_password=hashed, is_active=True)
+
+
+def _app(primary: str, replicas: list[str]):
+    return create_app(Settings(
+        DATABASE_URL=primary, DATABASE_REPLICA_URLS=replicas, JWT_SECRET_KEY="k" * 32,
+        BCRYPT_ROUNDS=4, EMAIL_OUTBOX_ENABLED=False, INTERNAL_STATS_TOKEN="ops-secret", LOGIN_LOCKOUT_ENABLED=False, USER_CACHE_ENABLED=False,
+    ))
+
+
+def test_replica_set_round_robin_and_ejection(tmp_path):
+    engines = [(f"replica-{i}", create_engine(f"sqlite:///{tmp_path}/r{i}.db")) for i in range(2)]
+    replicas = ReplicaSet(engines, eject_seconds=0.05)
+    assert {replicas.choose(), replicas.choose()} == {e for _, e in engines}
+    replicas.eject("replica-0")
+    assert [replicas.choose() for _ in range(3)] == [engines[1][1]] * 3
+    replicas.eject("replica-1")
+    assert replicas.choose() is None
+    assert replicas.stats()["replica-1"]["healthy"] is False
+    time.sleep(0.06)
+    assert replicas.choose() is not None
+
+
+def test_reads_go_to_replica_until_the_session_writes(tmp_path, restore_settings):
+    user_id = uuid.uuid4()
+    primary = _database(tmp_path / "primary.db", _user(user_id, "primary", "x"))
+    replica = _database(tmp_path / "replica.db", _user(user_id, "replica", "x"))
+    _app(primary, [replica])
+    db = RoutingSession(bind=get_engine(), replicas=get_replicas(), expire_on_commit=False)
+    assert read_only(get_user, db, user_id).full_name == "replica"
+    db.expunge_all()
+    assert get_user_by_email(db, "replica@example.com").full_name == "primary"  # unmarked reads use the primary
+    db.expunge_all()
+    db.add(RefreshToken(jti="pin", user_id=user_id, expires_at=datetime.now(timezone.utc) + timedelta(days=1)))
+    db.flush()
+    db.expunge_all()
+    assert read_only(get_user, db, user_id).full_name == "primary"
+    db.close()
+
+
+@pytest.mark.asyncio
+async def test_login_reads_from_replica_me_and_refresh_use_primary(tmp_path, restore_settings):
+    user_id = uuid.uuid4()
+    _app("sqlite://", [])  # configure BCRYPT_ROUNDS before hashing
+    hashed = hash_password("StrongPass1")
+    primary = _database(tmp_path / "primary.db", _user(user_id, "primary", hashed))
+    replica = _database(tmp_path / "replica.db", _user(user_id, "replica", hashed))
+    app = _app(primary, [replica])
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        r = await client.post("/auth/login", json={"email": "replica@example.com", "password": "StrongPass1"})
+        assert r.status_code == 200
+        tokens = r.json()
+        # revocation state is never read from a replica
+        r = await client.get("/users/me", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+        assert r.json()["full_name"] == "primary"
+        # the refresh token row only exists on the primary
+        r = await client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+        assert r.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_missing_rows_and_dead_replicas_fall_back_to_primary(tmp_path, restore_settings):
+    user_id = uuid.uuid4()
+    _app("sqlite://", [])
+    hashed = hash_password("StrongPass1")
+    primary = _database(tmp_path / "primary.db", _user(user_id, "primary", hashed))
+    lagging = _database(tmp_path / "lagging.db")  # the user has not replicated yet
+    dead = f"sqlite:///{tmp_path}/missing-dir/dead.db"
+    app = _app(primary, [lagging, dead])
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        for _ in range(2):  # one login per replica
+            r = await client.post("/auth/login", json={"email": "replica@example.com", "password": "StrongPass1"})
+            assert r.status_code == 200
+        r = await client.get("/internal/stats", headers={"X-Internal-Token": "ops-secret"})
+        replicas = r.json()["db_replicas"]
+    assert replicas["replica-0"]["healthy"] is True
+    assert replicas["replica-1"]["healthy"] is False
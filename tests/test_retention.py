@@ -0,0 +1,18 @@
+from datetime import datetime, timedelta, timezone
+
+from app.models.token import TokenBlacklist
+from app.services.retention import purge_expired, run_purge
+
+
+def test_purge_expired_deletes_in_batches(db, session_factory):
+    now = datetime.now(timezone.utc)
+    db.add_all([TokenBlacklist(jti=f"old{i}", expires_at=now - timedelta(minutes=1)) for i in range(5)])
+    db.add(TokenBlacklist(jti="live", expires_at=now + timedelta(minutes=5)))
+    db.add(TokenBlacklist(jti="forever", expires_at=None))
+    db.commit()
+
+    assert purge_expired(db, TokenBlacklist, batch_size=2) == 5
+    assert {r.jti for r in db.query(TokenBlacklist).all()} == {"live", "forever"}
+
+    report = run_purge(session_factory, batch_size=2, pause=0)
+    assert report == {"refresh_tokens": 0, "token_blacklist": 0, "email_tokens": 0, "email_outbox": 0}
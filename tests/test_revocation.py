@@ -0,0 +1,42 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.models.token import TokenBlacklist
+from app.services.revocation import RevocationCache
+
+
+def test_revocation_cache_refreshes_incrementally_and_evicts(db):
+    now = datetime.now(timezone.utc)
+    db.add(TokenBlacklist(jti="old", expires_at=now + timedelta(minutes=5)))
+    db.add(TokenBlacklist(jti="gone", expires_at=now - timedelta(minutes=5)))
+    db.commit()
+
+    cache = RevocationCache(enabled=True, max_staleness=60)
+    assert cache.is_revoked(db, "old")
+    assert not cache.is_revoked(db, "gone")
+
+    # rows written by another worker show up only after the staleness window
+    db.add(TokenBlacklist(jti="new", expires_at=now + timedelta(minutes=5)))
+    db.commit()
+    assert not cache.is_revoked(db, "new")
+    cache.refresh(db)
+    assert cache.is_revoked(db, "new")
+
+    cache.add("short", now + timedelta(seconds=-1))
+    assert not cache.is_revoked(db, "short")
+
+
+def test_full_reload_finds_rows_the_incremental_window_skipped(db):
+    now = datetime.now(timezone.utc)
+    db.add(TokenBlacklist(jti="first", expires_at=now + timedelta(minutes=5)))
+    db.commit()
+    cache = RevocationCache(enabled=True, max_staleness=60, full_refresh=0.05)
+    cache.refresh(db)
+    # stamped by a host whose clock lags (or committed long after it was stamped)
+    db.add(TokenBlacklist(jti="late", expires_at=now + timedelta(minutes=5), created_at=now - timedelta(hours=1)))
+    db.commit()
+    cache.refresh(db)
+    assert not cache.is_revoked(db, "late")
+    time.sleep(0.06)
+    cache.refresh(db)
+    assert cache.is_revoked(db, "late")
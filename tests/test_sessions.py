@@ -0,0 +1,92 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import inspect, text
+
+from app.models.token import RefreshToken
+from app.services.sessions import ensure_session_schema
+
+
+async def _login(client, email: str, agent: str) -> dict:
+    r = await client.post("/auth/login", json={"email": email, "password": "StrongPass1"}, headers={"User-Agent": agent})
+    assert r.status_code == 200
+    return r.json()
+
+
+@pytest.mark.asyncio
+async def test_list_and_revoke_sessions(app):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.post("/auth/register", json={"email": "s@example.com", "password": "StrongPass1"})
+        laptop = await _login(client, "s@example.com", "laptop")
+        phone = await _login(client, "s@example.com", "phone")
+        r = await client.post("/auth/refresh", json={"refresh_token": phone["refresh_token"]}, headers={"User-Agent": "phone/2"})
+        phone = r.json()
+        headers = {"Authorization": f"Bearer {laptop['access_token']}"}
+
+        r = await client.get("/users/me/sessions", headers=headers)
+        page = r.json()
+        assert r.status_code == 200 and page["next_cursor"] is None
+        # rotation keeps one row per session, with the latest client details
+        assert [(s["user_agent"], s["current"]) for s in page["items"]] == [("phone/2", False), ("laptop", True)]
+        assert page["items"][0]["ip_address"] and page["items"][0]["last_used_at"]
+
+        r = await client.delete(f"/users/me/sessions/{page['items'][0]['id']}", headers=headers)
+        assert r.status_code == 204
+        r = await client.post("/auth/refresh", json={"refresh_token": phone["refresh_token"]})
+        assert r.status_code == 401 and r.json()["detail"]["code"] == "refresh_revoked"
+        r = await client.delete(f"/users/me/sessions/{page['items'][0]['id']}", headers=headers)
+        assert r.status_code == 404
+
+        # another user's session ids are not found, not revoked
+        await client.post("/auth/register", json={"email": "other@example.com", "password": "StrongPass1"})
+        other = await _login(client, "other@example.com", "x")
+        r = await client.delete(f"/users/me/sessions/{page['items'][1]['id']}", headers={"Authorization": f"Bearer {other['access_token']}"})
+        assert r.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_keyset_pagination_skips_revoked_history(app, db):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.post("/auth/register", json={"email": "p@example.com", "password": "StrongPass1"})
+        tokens = await _login(client, "p@example.com", "a")
+        r = await client.get("/users/me", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+        user_id = uuid.UUID(r.json()["id"])
+    now = datetime.now(timezone.utc)
+    # revoked/expired history plus five live sessions, two sharing an expiry to exercise the jti tie-break
+    db.add_all([RefreshToken(jti=f"old{i}", user_id=user_id, revoked=True, expires_at=now + timedelta(days=1)) for i in range(20)])
+    db.add(RefreshToken(jti="expired", user_id=user_id, revoked=False, expires_at=now - timedelta(seconds=1)))
+    expiries = [now + timedelta(hours=h) for h in (1, 2, 2, 3, 4)]
+    db.add_all([RefreshToken(jti=f"live{i}", family_id=f"fam{i}", user_id=user_id, revoked=False, expires_at=e) for i, e in enumerate(expiries)])
+    db.commit()
+
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    seen, cursor = [], None
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        for _ in range(4):
+            params = {"limit": 2} | ({"cursor": cursor} if cursor else {})
+            page = (await client.get("/users/me/sessions", params=params, headers=headers)).json()
+            seen += [s["id"] for s in page["items"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        # the login's own session plus the five live rows, each exactly once
+        assert len(seen) == len(set(seen)) == 6
+        assert not any(i.startswith("old") or i == "expired" for i in seen)
+        r = await client.get("/users/me/sessions", params={"cursor": "not-a-cursor"}, headers=headers)
+        assert r.status_code == 400 and r.json()["detail"]["code"] == "invalid_cursor"
+
+
+def test_schema_upgrade_adds_columns_and_replaces_user_index(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE refresh_tokens (id CHAR(32) PRIMARY KEY, jti VARCHAR(64) UNIQUE NOT NULL, user_id CHAR(32) NOT NULL, "
+            "parent_jti VARCHAR(64), family_id VARCHAR(64), revoked BOOLEAN NOT NULL, expires_at DATETIME NOT NULL, created_at DATETIME)"
+        ))
+        conn.execute(text("CREATE INDEX ix_refresh_tokens_user_id ON refresh_tokens (user_id)"))
+    assert ensure_session_schema(engine) == ["user_agent", "ip_address", "last_used_at"]
+    assert ensure_session_schema(engine) == []
+    indexes = {i["name"]: tuple(i["column_names"]) for i in inspect(engine).get_indexes("refresh_tokens")}
+    assert indexes["ix_refresh_tokens_user_active"] == ("user_id", "revoked", "expires_at")
+    assert "ix_refresh_tokens_user_id" not in indexes
@@ -0,0 +1,20 @@
+import time
+
+from app.core.token_cache import VerifiedTokenCache
+
+
+def test_token_cache_evicts_at_exp_and_by_size():
+    cache = VerifiedTokenCache(enabled=True, max_size=2)
+    a, b, c = (cache.key(t) for t in ("a", "b", "c"))
+    cache.put(a, {"sub": "a", "exp": time.time() + 60})
+    cache.put(b, {"sub": "b", "exp": time.time() - 1})
+    assert cache.get(a)["sub"] == "a"
+    assert cache.get(b) is None  # already expired
+    cache.put(b, {"sub": "b", "exp": time.time() + 60})
+    cache.put(c, {"sub": "c", "exp": time.time() + 60})
+    assert cache.get(a) is None  # least recently used
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+    payload = cache.get(c)
+    payload["sub"] = "tampered"
+    assert cache.get(c)["sub"] == "c"
@@ -0,0 +1,39 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import inspect, text
+
+from app.models.token import RefreshToken
+from app.services.token_families import backfill_families, ensure_family_schema
+
+
+def test_schema_upgrade_adds_column_and_indexes_once(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE refresh_tokens (id CHAR(32) PRIMARY KEY, jti VARCHAR(64) UNIQUE NOT NULL, user_id CHAR(32) NOT NULL, "
+            "parent_jti VARCHAR(64), revoked BOOLEAN NOT NULL, expires_at DATETIME NOT NULL, created_at DATETIME)"
+        ))
+    assert ensure_family_schema(engine) is True
+    assert ensure_family_schema(engine) is False
+    indexed = {tuple(i["column_names"]) for i in inspect(engine).get_indexes("refresh_tokens")}
+    assert {("family_id",), ("parent_jti",), ("user_id", "revoked", "expires_at")} <= indexed
+
+
+def test_backfill_follows_parent_chains(db):
+    user_id = uuid.uuid4()
+    expires = datetime.now(timezone.utc) + timedelta(days=1)
+    # a -> b -> c is one login; x and y were rotated from a parent that retention already purged
+    for jti, parent in (("c", "b"), ("a", None), ("b", "a"), ("x", "purged"), ("y", "purged"), ("z", None)):
+        db.add(RefreshToken(jti=jti, parent_jti=parent, user_id=user_id, revoked=False, expires_at=expires))
+    db.commit()
+
+    assert backfill_families(db, batch_size=2) == 6
+    families = dict(db.query(RefreshToken.jti, RefreshToken.family_id).all())
+    assert families == {"a": "a", "b": "a", "c": "a", "x": "purged", "y": "purged", "z": "z"}
+    assert backfill_families(db) == 0
+    # rotated from an already backfilled token before the migration finished
+    for jti, parent in (("e", "d"), ("d", "c")):
+        db.add(RefreshToken(jti=jti, parent_jti=parent, user_id=user_id, revoked=False, expires_at=expires))
+    db.commit()
+    assert backfill_families(db) == 2
+    assert dict(db.query(RefreshToken.jti, RefreshToken.family_id).filter(RefreshToken.jti.in_(["d", "e"])).all()) == {"d": "a", "e": "a"}
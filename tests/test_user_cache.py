@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+
+from app.core.config import Settings
+from app.db.base import Base
+from app.db.session import get_engine
+from app.main import create_app
+from app.models.user import User, Role
+from app.services.user_cache import UserStateCache, ensure_user_token_schema, user_cache
+
+# a second worker: its own process, caches and app, on the same database
+OTHER_WORKER = """
+import asyncio
+from httpx import AsyncClient
+from app.main import create_app
+
+async def main():
+    async with AsyncClient(app=create_app(), base_url="http://test") as client:
+        r = await client.post("/auth/login", json={"email": "shared@example.com", "password": "StrongPass1"})
+        r = await client.post("/auth/logout-all", headers={"Authorization": f"Bearer {r.json()['access_token']}"})
+        assert r.status_code == 204, r.text
+
+asyncio.run(main())
+"""
+
+
+def _user(version: int = 0) -> User:
+    return User(id=uuid.uuid4(), email=f"{uuid.uuid4().hex}@example.com", hashed_password="x", full_name=None,
+                is_active=True, role=Role.user, email_verified_at=None, token_version=version)
+
+
+def test_user_cache_lru_and_version_check():
+    cache = UserStateCache(enabled=True, max_size=2, ttl=60)
+    a, b, c = _user(), _user(), _user(version=3)
+    cache.put(a)
+    cache.put(b)
+    assert cache.get(a.id).email == a.email  # a is now most recent
+    cache.put(c)
+    assert cache.get(b.id) is None  # evicted as least recently used
+    assert cache.get(c.id, min_version=3) is not None
+    assert cache.get(c.id, min_version=4) is None  # newer token -> stale entry dropped
+    cache.invalidate(a.id)
+    assert cache.get(a.id) is None
+
+
+def test_user_cache_returns_independent_copies():
+    cache = UserStateCache(enabled=True, max_size=10, ttl=60)
+    u = _user()
+    cache.put(u)
+    first = cache.get(u.id)
+    first.full_name = "changed"
+    assert cache.get(u.id).full_name is None
+
+
+@pytest.mark.asyncio
+async def test_logout_all_on_another_worker_reaches_this_cache(tmp_path, restore_settings):
+    env = {
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'shared.db'}", "JWT_SECRET_KEY": "k" * 32, "BCRYPT_ROUNDS": "4",
+        "EMAIL_OUTBOX_ENABLED": "false", "REVOCATION_CACHE_MAX_STALENESS_SECONDS": "0",
+    }
+    app = create_app(Settings(**env))
+    Base.metadata.create_all(bind=get_engine())
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.post("/auth/register", json={"email": "shared@example.com", "password": "StrongPass1"})
+        tokens = (await client.post("/auth/login", json={"email": "shared@example.com", "password": "StrongPass1"})).json()
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        assert (await client.get("/users/me", headers=headers)).status_code == 200
+        assert user_cache.stats()["size"] == 1  # the user row is now cached for USER_CACHE_TTL_SECONDS
+        subprocess.run([sys.executable, "-c", OTHER_WORKER], env={**os.environ, **env}, cwd=Path(__file__).parents[1], check=True, timeout=60)
+        r = await client.get("/users/me", headers=headers)
+        assert r.status_code == 401 and r.json()["detail"]["code"] == "token_revoked"
+
+
+def test_schema_upgrade_adds_token_columns(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id CHAR(32) PRIMARY KEY, email VARCHAR(255) NOT NULL, hashed_password VARCHAR(255) NOT NULL)"))
+        conn.execute(text("INSERT INTO users (id, email, hashed_password) VALUES ('a', 'old@example.com', 'x')"))
+    assert ensure_user_token_schema(engine) == ["token_version", "tokens_valid_after"]
+    assert ensure_user_token_schema(engine) == []
+    with engine.connect() as conn:
+        # existing users start at version 0, matching the tokens they already hold
+        # and no watermark, so none of those tokens is cut off by the upgrade
+        assert tuple(conn.execute(text("SELECT token_version, tokens_valid_after FROM users")).one()) == (0, None)
@@ -0,0 +1,121 @@
+import io
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from httpx import AsyncClient
+
+from app.core.security import _bcrypt_context
+from app.models.user import Role, User
+from app.services.user_import import UserImporter, read_rows
+
+FAST = _bcrypt_context(4)
+
+
+@pytest.fixture(autouse=True)
+def admin(db):
+    db.add(User(email="taken@example.com", hashed_password=FAST.hash("StrongPass1"), role=Role.admin, is_active=True, token_version=0))
+    db.commit()
+
+
+def _import(db, text: str, fmt: str, **kw) -> dict:
+    with ThreadPoolExecutor(2) as pool:
+        importer = UserImporter(executor=pool, rounds=4, **kw)
+        batches = list(importer.run(db, read_rows(io.StringIO(text), fmt)))
+    assert len(batches) == -(-importer.report["rows"] // importer.batch_size)
+    return importer.report
+
+
+def test_csv_import_reports_every_bad_row(db):
+    existing_hash = FAST.hash("Imported1")
+    text = (
+        "email,full_name,password,password_hash,role,email_verified\n"
+        "a@example.com,Ann,StrongPass1,,,\n"
+        f"b@example.com,Bob,,{existing_hash},admin,true\n"
+        "c@example.com,,weak,,,\n"
+        "not-an-email,,StrongPass1,,,\n"
+        "a@example.com,Again,StrongPass1,,,\n"
+        "taken@example.com,,StrongPass1,,,\n"
+        "d@example.com,,,,,\n"
+        "e@example.com,,,$2b$nope,,\n"
+    )
+    report = _import(db, text, "csv", batch_size=3)
+    assert (report["rows"], report["created"], report["conflicts"], report["invalid"]) == (8, 2, 2, 4)
+    assert [(e["line"], e["code"]) for e in report["errors"]] == [
+        (4, "weak_password"), (5, "invalid_row"), (6, "duplicate_in_file"),
+        (7, "email_taken"), (8, "missing_password"), (9, "invalid_hash"),
+    ]
+    a = db.query(User).filter_by(email="a@example.com").one()
+    b = db.query(User).filter_by(email="b@example.com").one()
+    assert FAST.verify("StrongPass1", a.hashed_password) and a.role == Role.user and a.email_verified_at is None
+    assert b.hashed_password == existing_hash and b.role == Role.admin and b.email_verified_at is not None
+
+
+def test_jsonl_import_and_insert_race(db, monkeypatch):
+    # the pre-insert check misses a concurrent registration; the INSERT conflict is retried without it
+    calls = []
+
+    def taken(db, emails):
+        calls.append(emails)
+        return set() if len(calls) == 1 else {e for e in emails if e == "taken@example.com"}
+
+    monkeypatch.setattr(UserImporter, "_taken", staticmethod(taken))
+    text = "\n".join([
+        json.dumps({"email": "x@example.com", "password": "StrongPass1"}),
+        "{not json",
+        json.dumps({"email": "taken@example.com", "password": "StrongPass1"}),
+        "",
+    ])
+    report = _import(db, text, "jsonl", max_errors=1)
+    assert (report["rows"], report["created"], report["conflicts"], report["invalid"]) == (3, 1, 1, 1)
+    assert report["errors"] == [{"line": 2, "email": None, "code": "invalid_row", "message": "Line is not a JSON object."}]
+    assert report["errors_truncated"] is True
+    assert db.query(User).filter_by(email="x@example.com").count() == 1
+
+
+def test_insert_retries_until_no_email_conflicts_remain(db, monkeypatch):
+    # registrations keep landing while the importer retries; each conflict becomes email_taken
+    db.add(User(email="late@example.com", hashed_password=FAST.hash("StrongPass1"), role=Role.user, is_active=True, token_version=0))
+    db.commit()
+    visible = [set(), {"taken@example.com"}, {"taken@example.com", "late@example.com"}]
+    monkeypatch.setattr(UserImporter, "_taken", staticmethod(lambda db, emails: visible.pop(0) & set(emails)))
+    text = "".join(json.dumps({"email": e, "password": "StrongPass1"}) + "\n" for e in ("taken@example.com", "y@example.com", "late@example.com"))
+    report = _import(db, text, "jsonl")
+    assert (report["created"], report["conflicts"]) == (1, 2)
+    assert [(e["line"], e["code"]) for e in report["errors"]] == [(1, "email_taken"), (3, "email_taken")]
+    assert db.query(User).filter_by(email="y@example.com").count() == 1
+
+
+@pytest.mark.asyncio
+async def test_async_import_reads_and_validates_off_the_event_loop(db):
+    loop_thread, reader_threads = threading.get_ident(), set()
+    hashed = FAST.hash("StrongPass1")
+
+    def rows():
+        # stands in for read_rows over the upload: every row is pulled in a worker thread
+        for i in range(5):
+            reader_threads.add(threading.get_ident())
+            yield i + 1, {"email": f"t{i}@example.com", "password_hash": hashed}
+
+    importer = UserImporter(batch_size=2)
+    reports = [dict(r) async for r in importer.run_async(db, rows())]
+    assert [r["created"] for r in reports] == [2, 4, 5]
+    assert reader_threads and loop_thread not in reader_threads
+
+
+@pytest.mark.asyncio
+async def test_import_endpoint_streams_progress_for_admins(app):
+    text = "".join(json.dumps({"email": f"u{i}@example.com", "password_hash": FAST.hash("StrongPass1")}) + "\n" for i in range(3))
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        r = await client.post("/auth/login", json={"email": "taken@example.com", "password": "StrongPass1"})
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        r = await client.post("/users/import", headers=headers, files={"file": ("users.jsonl", text)})
+        assert r.status_code == 200
+        lines = [json.loads(line) for line in r.text.splitlines()]
+        assert lines[-1]["report"]["created"] == 3 and "progress" in lines[0]
+
+        r = await client.post("/auth/register", json={"email": "plain@example.com", "password": "StrongPass1"})
+        r = await client.post("/auth/login", json={"email": "plain@example.com", "password": "StrongPass1"})
+        r = await client.post("/users/import", headers={"Authorization": f"Bearer {r.json()['access_token']}"}, files={"file": ("u.csv", "email\n")})
+        assert r.status_code == 403